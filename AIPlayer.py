@@ -1,334 +1,1331 @@
-import copy  # For shallow copy of list
 import math  # for mathematical function
 import random  # for random moves
-import datetime  # to display date and time
+import struct  # for position snapshots in shared memory
+import time  # for the search deadline
+import threading  # for pondering and cancellation
+from TranspositionTable import *
+from MoveOrdering import MoveOrderer
+from SearchStats import SearchStats
+
+
+# Raised inside the search when the time budget of the current move runs out or the search is cancelled
+class SearchTimeout(Exception):
+    pass
+
+
+# Lets another thread stop a search. The search checks it every AIPlayer.TIME_CHECK_INTERVAL nodes
+# and then returns the best move of the deepest completed iteration.
+class CancellationToken:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    def isCancelled(self):
+        return self.event.is_set()
 
 
 class AIPlayer:
-    def __init__(self, game, difficulty):
+    # Check the clock and the cancellation token every this many nodes
+    TIME_CHECK_INTERVAL = 1024
+    # Shallower searches finish faster than the worker processes can be handed the work
+    PARALLEL_MIN_DEPTH = 5
+    # How the worker processes share a search: "rootsplit" searches different root moves in every process,
+    # "lazysmp" searches the whole root in every process with one shared transposition table
+    PARALLEL_MODES = ("rootsplit", "lazysmp")
+    # Search mode of every difficulty level without a searchMode of its own:
+    # "alphabeta" searches every node with the full window,
+    # "pvs" uses principal variation search with aspiration windows
+    SEARCH_MODES = {1: "pvs", 2: "alphabeta"}
+    # Aspiration windows start this far on both sides of the previous iteration's value,
+    # from this depth on
+    ASPIRATION_WINDOW = 25
+    ASPIRATION_MIN_DEPTH = 3
+    # A game has at most this many captures, so quiescence search never goes deeper below the depth limit
+    MAX_CAPTURES = 23
+
+    # timeLimit: seconds the AI may think about one move, leaving headroom under the 15-second limit
+    # workers: number of processes that search root moves in parallel, 1 searches in this process only
+    # searchDepth: search at most this deep instead of the depth limit of the difficulty level
+    # weights: weights of the utility and heuristic values, see DEFAULT_WEIGHTS
+    # tablebase: path of an endgame tablebase file built by Tablebase.py, probed instead of searching endgames
+    # openingBook: path of an opening book file built by OpeningBook.py, its moves are played without searching
+    # ponder: think about the human's possible replies while the human thinks, see startPondering
+    # searchMode: "alphabeta" or "pvs" instead of the search mode of the difficulty level, see SEARCH_MODES
+    # quiescenceNodes: node budget of the quiescence search below every leaf of the search, 0 turns it off
+    # parallelMode: how more than one worker share the search, see PARALLEL_MODES
+    def __init__(self, game, difficulty, timeLimit=14, ttMemory=64 * 1024 * 1024, ttReplacement="depth",
+                 workers=1, searchDepth=None, weights=None, tablebase=None, openingBook=None,
+                 ponder=False, searchMode=None, quiescenceNodes=64, parallelMode="rootsplit"):
         self.game = game
         self.difficulty = difficulty
+        self.searchMode = searchMode if searchMode is not None else self.SEARCH_MODES.get(difficulty, "pvs")
+        if self.searchMode not in ("alphabeta", "pvs"):
+            raise ValueError("Unknown search mode: {0}".format(searchMode))
+        if parallelMode not in self.PARALLEL_MODES:
+            raise ValueError("Unknown parallel mode: {0}".format(parallelMode))
+        self.parallelMode = parallelMode
+        self.timeLimit = timeLimit
+        self.searchDepth = searchDepth
+        self.quiescenceNodes = quiescenceNodes
+        # nodes the quiescence search of the current leaf may still visit
+        self.quiescenceBudget = 0
+        self.weights = DEFAULT_WEIGHTS if weights is None else tuple(weights)
+        if len(self.weights) != len(DEFAULT_WEIGHTS):
+            raise ValueError("Expected {0:d} weights: {1}".format(len(DEFAULT_WEIGHTS), weights))
+        if workers > 1 and parallelMode == "lazysmp" and maxAbsValue(self.weights) >= VALUE_BIAS:
+            raise ValueError("The weights {0} give values too large for the shared transposition table".format(
+                weights))
+        self.openingBook = None
+        if openingBook is not None:
+            from OpeningBook import OpeningBook
+            self.openingBook = OpeningBook(openingBook)
+            if self.openingBook.weights != self.weights:
+                raise ValueError("The opening book {0} was built for the weights {1}".format(
+                    openingBook, self.openingBook.weights))
+        self.tablebasePath = tablebase
+        self.tablebase = None
+        # positions with at most this many checkers are looked up in the tablebase
+        self.tablebasePieces = 0
+        if tablebase is not None:
+            from Tablebase import Tablebase
+            self.tablebase = Tablebase(tablebase)
+            if not self.tablebase.supportsWeights(self.weights):
+                self.tablebase.close()
+                raise ValueError("The tablebase {0} was built for the utility weights {1}".format(
+                    tablebase, self.tablebase.utilityWeights))
+            self.tablebasePieces = self.tablebase.maxPieces
+        self.deadline = None
+        self.cancelToken = CancellationToken()
+        self.workers = workers
+        self.executor = None
+        # shared memory with the root position of the parallel search and the number of the last search
+        self.sharedRoot = None
+        self.rootId = 0
+        # positions searched so far, kept between moves; in shared memory for the Lazy SMP search
+        self.ttMemory = ttMemory
+        self.ttReplacement = ttReplacement
+        self.transpositionTable = TranspositionTable(ttMemory, ttReplacement)
+        if self.workers > 1 and parallelMode == "lazysmp":
+            self.getSharedTable()
+        # Lazy SMP helpers start the root with the move this many places further down the move order
+        self.rootRotation = 0
+        self.moveOrderer = MoveOrderer()
+        # principal variation of the last completed search, as packed moves
+        self.pv = []
+        # one list of moves per ply, reused by every node of the search
+        self.moveStack = []
+        self.followPV = False
+        # pondering thread and the token that stops it
+        self.ponder = ponder
+        self.ponderThread = None
+        self.ponderToken = None
+        self.pondering = False
+        self.ponderLock = threading.Lock()
+        # ponderResults[hash of the position after a reply] = SearchStats of the search of the AI's answer
+        self.ponderResults = {}
+        # statistics of the last search, and the functions that get the statistics of every move
+        self.searchStats = SearchStats()
+        self.observers = []
+
+    # Call observer(stats) with the SearchStats of every move getNextMove returns,
+    # e.g. a SearchStats.JSONLinesExporter. Observers are called on the thread of getNextMove.
+    def addObserver(self, observer):
+        self.observers.append(observer)
 
-    def getNextMove(self):
-        if self.difficulty == 2:
-            return self.getNextMoveMedium()
-        else:  # Only medium and hard levels remain
-            return self.getNextMoveHard()
+    def removeObserver(self, observer):
+        self.observers.remove(observer)
+
+    # Returns the AI's move (oldrow, oldcol, row, col) in the given AIGameState,
+    # by default in the current position of the game.
+    # Cancelling the given CancellationToken ends the search early with the best move found so far.
+    def getNextMove(self, state=None, cancelToken=None):
+        if state is None:
+            state = AIGameState(self.game)
+        state.weights = self.weights
+        self.stopPondering()
+        self.cancelToken = cancelToken if cancelToken is not None else CancellationToken()
+        move = None
+        if self.openingBook is not None:
+            move = self.getBookMove(state)
+        if move is None:
+            move = self.getPonderMove(state)
+        if move is None:
+            if self.difficulty == 2:
+                move = self.getNextMoveMedium(state)
+            else:  # Only medium and hard levels remain
+                move = self.getNextMoveHard(state)
+        for observer in self.observers:
+            observer(self.searchStats)
+        return move
 
     # Medium AI, returns the move found by alpha-beta search with depth limit 5
-    def getNextMoveMedium(self):
-        state = AIGameState(self.game)
-        nextMove = self.alphaBetaSearch(state, 5)
+    def getNextMoveMedium(self, state):
+        nextMove = self.iterativeDeepeningSearch(state, self.getDepthLimit(state), self.timeLimit)
         return nextMove[0], nextMove[1], nextMove[2], nextMove[3]
 
     # Hard AI, returns the best move found by alpha-beta search
-    def getNextMoveHard(self):
-        state = AIGameState(self.game)
-        depthLimit = self.computeDepthLimit(state)
-        nextMove = self.alphaBetaSearch(state, depthLimit)
+    def getNextMoveHard(self, state):
+        depthLimit = self.getDepthLimit(state)
+        nextMove = self.iterativeDeepeningSearch(state, depthLimit, self.timeLimit)
         return nextMove[0], nextMove[1], nextMove[2], nextMove[3]
 
+    # Depth limit of the search in the given state: 5 for the medium AI, computeDepthLimit for the hard AI
+    def getDepthLimit(self, state):
+        if self.searchDepth:
+            return self.searchDepth
+        return 5 if self.difficulty == 2 else self.computeDepthLimit(state)
+
+    # Return the move of the opening book for the given state, None if the book does not have the position
+    def getBookMove(self, state):
+        move = self.openingBook.lookup(state.hash)
+        # a different position with the same hash is unlikely, but its move would not be legal
+        if move is None or list(move) not in state.getActions(False):
+            return None
+        self.searchStats = SearchStats("book")
+        self.searchStats.move = move
+        return move
+
+    # Start thinking in the background about the AI's answers to the human's possible replies in the given
+    # state, where the human moves next. The predicted reply of the last principal variation comes first.
+    # The searches fill the transposition table that the next search shares. Does nothing unless ponder is on.
+    def startPondering(self, state):
+        self.stopPondering()
+        if not self.ponder:
+            return
+        state = AIGameState.fromSnapshot(state.snapshot())
+        state.weights = self.weights
+        replies = self.moveOrderer.orderRootMoves(state.generateMoves(True, []), None,
+                                                  self.pv[1] if len(self.pv) > 1 else None)
+        if not replies:
+            return
+        with self.ponderLock:
+            self.ponderResults = {}
+            self.ponderToken = CancellationToken()
+            self.ponderThread = threading.Thread(target=self.ponderReplies, args=(state, replies, self.ponderToken),
+                                                 daemon=True)
+            self.ponderThread.start()
+
+    # Stop pondering and wait for the pondering thread to end. Keeps the results for getNextMove.
+    def stopPondering(self):
+        with self.ponderLock:
+            thread = self.ponderThread
+            if thread is not None:
+                self.ponderToken.cancel()
+            self.ponderThread = None
+        if thread is not None:
+            thread.join()
+
+    # Pondering thread: search the AI's answer to one reply after the other, until the token is cancelled
+    def ponderReplies(self, state, replies, token):
+        self.pondering = True
+        self.cancelToken = token
+        for reply in replies:
+            captured = state.makeMove(reply)
+            if state.AIPieces and state.humanPieces and state.AICanContinue():
+                self.iterativeDeepeningSearch(state, self.getDepthLimit(state), math.inf)
+                self.ponderResults[state.hash] = self.searchStats
+            state.unmakeMove(reply, captured)
+            if token.isCancelled():
+                break
+        self.pondering = False
+
+    # Return the move found by pondering in the given state, if the pondering search of the human's actual
+    # reply completed its depth limit or has thought at least as long as a search would (a ponder hit).
+    # None otherwise; the search then still finds the pondered positions in the transposition table.
+    def getPonderMove(self, state):
+        stats = self.ponderResults.get(state.hash)
+        self.ponderResults = {}
+        if stats is None:
+            return None
+        if (stats.completedDepth < stats.depthLimit and stats.seconds < self.timeLimit) \
+                or list(stats.move) not in state.getActions(False):
+            return None
+        self.pv = [packMove(action) for action in stats.pv]
+        stats.source = "ponder"
+        self.searchStats = stats
+        return stats.move
+
     # Dynamically compute depth limit
     # Fewer checkers we have, deeper level we can search
     def computeDepthLimit(self, state):
-        numcheckers = len(state.AICheckers) + len(state.humanCheckers)
+        numcheckers = state.numAICheckers() + state.numHumanCheckers()
         return 26 - numcheckers
 
-    def alphaBetaSearch(self, state, depthLimit):
+    # Run alpha-beta searches with depth limit 1, 2, ... up to maxDepth until timeLimit seconds have passed.
+    # Each iteration tries the principal variation of the previous one first.
+    # Returns the best move of the deepest search that completed; the first iteration always completes.
+    # The statistics of all iterations are collected in self.searchStats.
+    def iterativeDeepeningSearch(self, state, maxDepth, timeLimit):
+        starttime = time.perf_counter()
+        deadline = starttime + timeLimit
+        stats = self.searchStats = SearchStats("search", maxDepth)
+        moves = state.generateMoves(False, [])
+        if len(moves) == 1:  # nothing to think about
+            stats.move = tuple(MOVE_ACTIONS[moves[0]])
+            return MOVE_ACTIONS[moves[0]]
+
+        self.pv = []
+        bestMove = MOVE_ACTIONS[moves[0]]
+        value = None
+        for depthLimit in range(1, maxDepth + 1):
+            self.deadline = deadline if depthLimit > 1 else None
+            snapshot = state.snapshot()
+            iterationStart = time.perf_counter()
+            nodes = stats.getNodes()
+            try:
+                bestMove, value = self.aspirationSearch(state, depthLimit, value)
+            except SearchTimeout:
+                # the search was interrupted in the middle of a line, restore the root position
+                state.restore(snapshot)
+                stats.timedOut = True
+                break
+            finally:
+                self.deadline = None
+                stats.addSearch(self.getSearchCounters())
+            self.pv = self.pvTable[0]
+            stats.completedDepth = depthLimit
+            stats.iterations.append((depthLimit, time.perf_counter() - iterationStart, stats.getNodes() - nodes,
+                                     value))
+            if time.perf_counter() >= deadline or self.cancelToken.isCancelled():
+                break
+        stats.move = tuple(bestMove)
+        stats.value = value
+        stats.pv = [MOVE_ACTIONS[move] for move in self.pv]
+        stats.seconds = time.perf_counter() - starttime
+        return bestMove
+
+    # Search the root with a window around the value of the previous iteration (guess), in the pvs mode.
+    # When the value falls outside the window, that side of the window is opened and the root searched again.
+    # Returns the best move and its value.
+    def aspirationSearch(self, state, depthLimit, guess):
+        alpha, beta = -math.inf, math.inf
+        if self.searchMode == "pvs" and guess is not None and depthLimit >= self.ASPIRATION_MIN_DEPTH:
+            alpha, beta = guess - self.ASPIRATION_WINDOW, guess + self.ASPIRATION_WINDOW
+        while True:
+            # pondering stays in this process, so that it can stop at once
+            if self.workers > 1 and depthLimit >= self.PARALLEL_MIN_DEPTH and not self.pondering:
+                if self.parallelMode == "lazysmp":
+                    bestMove = self.lazySMPSearch(state, depthLimit, alpha, beta)
+                else:
+                    bestMove = self.parallelAlphaBetaSearch(state, depthLimit, alpha, beta)
+            else:
+                bestMove = self.alphaBetaSearch(state, depthLimit, alpha, beta)
+            v = self.rootValue
+            if alpha < v < beta:
+                return bestMove, v
+            # the nodes of the failed search count as well
+            self.searchStats.addSearch(self.getSearchCounters())
+            self.searchStats.researches += 1
+            if v <= alpha:
+                alpha = -math.inf
+            else:
+                beta = math.inf
+
+    # Search the root with the window (alpha, beta), the full window by default.
+    # Utility values exceed any fixed bound, so the full window is unbounded.
+    # Returns the best action [oldrow, oldcol, row, col]; self.bestMove is the packed move.
+    def alphaBetaSearch(self, state, depthLimit, alpha=-math.inf, beta=math.inf):
+        self.startSearch(depthLimit)
+        v = self.maxValue(state, alpha, beta, self.depthLimit)
+        self.rootValue = v
+        return MOVE_ACTIONS[self.bestMove] if self.bestMove is not None else None
+
+    # Same search as alphaBetaSearch, with the root actions split across worker processes.
+    # The first (most promising) action is searched here to get a lower bound for the others,
+    # then the remaining actions are searched by the workers at the same time (Young Brothers Wait).
+    def parallelAlphaBetaSearch(self, state, depthLimit, alpha=-math.inf, beta=math.inf):
+        self.startSearch(depthLimit)
+
+        entry = self.transpositionTable.lookup(state.hash)
+        actions = self.moveOrderer.orderRootMoves(state.generateMoves(False, []), entry[MOVE] if entry else None,
+                                                  self.getPVMove(0))
+        self.currentDepth = 1
+        self.maxDepth = 1
+        self.numNodes = 1
+
+        best = actions[0]
+        v = self.searchAction(state, best, alpha, beta, depthLimit)
+        pv = [best] + self.pvTable[1]
+
+        if v < beta and len(actions) > 1:
+            executor = self.getExecutor()
+            # the workers read the root from shared memory instead of receiving it with every task
+            sharedRoot = self.getSharedRoot()
+            self.rootId += 1
+            state.packSnapshot(sharedRoot.buf, ROOT_ID.size)
+            ROOT_ID.pack_into(sharedRoot.buf, 0, self.rootId)
+            timeLimit = None if self.deadline is None else self.deadline - time.perf_counter()
+            futures = [executor.submit(searchRootAction, sharedRoot.name, self.rootId, a, max(alpha, v), beta,
+                                       depthLimit, timeLimit, state.weights, self.tablebasePath, self.searchMode,
+                                       self.quiescenceNodes)
+                       for a in actions[1:]]
+            try:
+                # Go through the results in move order. Values above the eldest brother's are exact,
+                # so this picks the first best move in the same root order as alphaBetaSearch does.
+                for a, future in zip(actions[1:], futures):
+                    value, line, counters = self.waitForResult(future)
+                    self.addSearchCounters(counters)
+                    if value > v:
+                        v = value
+                        best = a
+                        pv = line
+                    if v >= beta:
+                        self.maxPruning += 1
+                        break
+            finally:
+                for future in futures:
+                    future.cancel()
+                # a new search number stops the root actions still being searched after a cutoff,
+                # a timeout or a cancellation
+                self.rootId += 1
+                ROOT_ID.pack_into(sharedRoot.buf, 0, self.rootId)
+
+        self.currentDepth = 0
+        self.transpositionTable.store(state.hash, depthLimit, boundFlag(v, alpha, beta), v, best)
+        self.bestMove = best
+        self.pvTable[0] = pv
+        self.rootValue = v
+        return MOVE_ACTIONS[self.bestMove]
+
+    # Lazy SMP: the other workers search the same root as helpers, every second one a ply deeper and each
+    # starting with another root move, while this process runs alphaBetaSearch. All of them share one
+    # transposition table, so the positions the helpers search speed up this search, and the helpers
+    # spread out over the tree as they find each other's entries. The helpers are stopped as soon as
+    # this search is done, their own results are never used.
+    def lazySMPSearch(self, state, depthLimit, alpha=-math.inf, beta=math.inf):
+        executor = self.getExecutor()
+        table = self.getSharedTable()
+        sharedRoot = self.getSharedRoot()
+        self.rootId += 1
+        state.packSnapshot(sharedRoot.buf, ROOT_ID.size)
+        ROOT_ID.pack_into(sharedRoot.buf, 0, self.rootId)
+        timeLimit = None if self.deadline is None else self.deadline - time.perf_counter()
+        helpers = [executor.submit(searchHelper, sharedRoot.name, self.rootId, table.name, self.ttMemory,
+                                   self.ttReplacement, helper, depthLimit + helper % 2, alpha, beta, timeLimit,
+                                   state.weights, self.tablebasePath, self.searchMode, self.quiescenceNodes)
+                   for helper in range(1, self.workers)]
+        try:
+            bestMove = self.alphaBetaSearch(state, depthLimit, alpha, beta)
+        finally:
+            # a new search number stops the helpers
+            self.rootId += 1
+            ROOT_ID.pack_into(sharedRoot.buf, 0, self.rootId)
+        # stopped helpers return within TIME_CHECK_INTERVAL nodes
+        for future in helpers:
+            counters = future.result()
+            if counters is not None:
+                self.addSearchCounters(counters)
+        return bestMove
+
+    # Reset the statistics and the per-search tables before searching with the given depth limit
+    def startSearch(self, depthLimit):
         # collect statistics for the search
         self.currentDepth = 0
         self.maxDepth = 0
         self.numNodes = 0
         self.maxPruning = 0
         self.minPruning = 0
+        self.numFirstMoveCutoffs = 0
+        self.numTTCutoffs = 0
+        self.numTablebaseHits = 0
+        self.numQuiescenceNodes = 0
+        # leaves whose quiescence search ran out of its node budget
+        self.numQuiescenceBudgetHits = 0
+        # lookups in the transposition table are counted by the table, and by the workers of the parallel search
+        self.ttProbesAtStart = self.transpositionTable.probes
+        self.ttHitsAtStart = self.transpositionTable.hits
+        self.numWorkerTTProbes = 0
+        self.numWorkerTTHits = 0
 
-        self.bestMove = []
+        self.bestMove = None
         self.depthLimit = depthLimit
+        self.transpositionTable.newSearch()
+        self.moveOrderer.newSearch(depthLimit + 2)
+        # pvTable[ply] is the best line found from the node currently searched at that ply
+        self.pvTable = [[] for _ in range(depthLimit + 2)]
+        self.followPV = len(self.pv) > 0
+        # moveStack[ply] holds the moves of the node currently searched at that ply
+        if len(self.moveStack) < depthLimit + 2 + self.MAX_CAPTURES:
+            self.moveStack = [[] for _ in range(depthLimit + 2 + self.MAX_CAPTURES)]
+
+    # Counters of the current search, in the order of the SearchStats counter positions
+    def getSearchCounters(self):
+        return (self.maxDepth, self.numNodes, self.maxPruning, self.minPruning, self.numFirstMoveCutoffs,
+                self.transpositionTable.probes - self.ttProbesAtStart + self.numWorkerTTProbes,
+                self.transpositionTable.hits - self.ttHitsAtStart + self.numWorkerTTHits,
+                self.numTTCutoffs, self.numTablebaseHits, self.numQuiescenceNodes, self.numQuiescenceBudgetHits)
 
-        starttime = datetime.datetime.now()
-        v = self.maxValue(state, -1000, 1000, self.depthLimit)
+    # Add the counters of a root action searched by a worker process to those of the current search
+    def addSearchCounters(self, counters):
+        maxDepth, numNodes, maxPruning, minPruning, firstMoveCutoffs, ttProbes, ttHits, ttCutoffs, \
+            tablebaseHits, quiescenceNodes, quiescenceBudgetHits = counters
+        self.maxDepth = max(self.maxDepth, maxDepth)
+        self.numNodes += numNodes
+        self.maxPruning += maxPruning
+        self.minPruning += minPruning
+        self.numFirstMoveCutoffs += firstMoveCutoffs
+        self.numWorkerTTProbes += ttProbes
+        self.numWorkerTTHits += ttHits
+        self.numTTCutoffs += ttCutoffs
+        self.numTablebaseHits += tablebaseHits
+        self.numQuiescenceNodes += quiescenceNodes
+        self.numQuiescenceBudgetHits += quiescenceBudgetHits
+
+    # Value of the AI's packed root move, searched with depthLimit - 1 plies left below it
+    def searchAction(self, state, move, alpha, beta, depthLimit):
+        captured = state.makeMove(move)
+        v = self.minValue(state, alpha, beta, depthLimit - 1)
+        state.unmakeMove(move, captured)
+        return v
 
-        # print statistics for the search
+    # Process pool of the parallel search, started on first use
+    def getExecutor(self):
+        if self.executor is None:
+            import concurrent.futures  # only imported when needed, it takes longer to import than the whole engine
+            self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
 
-        print("Time = " + str(datetime.datetime.now() - starttime))
-        print("selected value " + str(v))
-        print("(1) max depth of the tree = {0:d}".format(self.maxDepth))
-        print("(2) total number of nodes generated = {0:d}".format(self.numNodes))
-        print("(3) number of times pruning occurred in the MAX-VALUE() = {0:d}".format(self.maxPruning))
-        print("(4) number of times pruning occurred in the MIN-VALUE() = {0:d}".format(self.minPruning))
+    # Shared memory of the parallel search, created on first use: the number of the search (ROOT_ID)
+    # followed by the snapshot of its root position (SNAPSHOT)
+    def getSharedRoot(self):
+        if self.sharedRoot is None:
+            from multiprocessing import shared_memory
+            self.sharedRoot = shared_memory.SharedMemory(create=True, size=ROOT_ID.size + SNAPSHOT.size)
+        return self.sharedRoot
 
-        return self.bestMove
+    # Transposition table of the Lazy SMP search in shared memory, replacing the table of this process
+    def getSharedTable(self):
+        if not isinstance(self.transpositionTable, SharedTranspositionTable):
+            self.transpositionTable = SharedTranspositionTable(self.ttMemory, self.ttReplacement)
+        return self.transpositionTable
+
+    # Wait for the result of a task of the parallel search, until the deadline passes or the search is cancelled
+    def waitForResult(self, future):
+        import concurrent.futures
+        while True:
+            try:
+                return future.result(timeout=0.05)
+            except concurrent.futures.TimeoutError:
+                if self.cancelToken.isCancelled() \
+                        or (self.deadline is not None and time.perf_counter() > self.deadline):
+                    raise SearchTimeout()
+
+    # Stop pondering and the worker processes of the parallel search and close the tablebase.
+    # Without wait, worker processes still busy with a root action exit once it is searched.
+    def shutdown(self, wait=True):
+        self.stopPondering()
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+            self.executor = None
+        if self.sharedRoot is not None:
+            self.sharedRoot.close()
+            self.sharedRoot.unlink()
+            self.sharedRoot = None
+        if isinstance(self.transpositionTable, SharedTranspositionTable):
+            self.transpositionTable.close()
+            self.transpositionTable = TranspositionTable(self.ttMemory, self.ttReplacement)
+        if self.tablebase is not None:
+            self.tablebase.close()
+            self.tablebase = None
+            self.tablebasePieces = 0
 
     # For AI player (MAX)
     def maxValue(self, state, alpha, beta, depthLimit):
-        if state.terminalTest():
+        if state.AIPieces == 0 or state.humanPieces == 0:
             return state.computeUtilityValue()
+        # solved endgame, the root still needs a move though
+        if (state.AIPieces | state.humanPieces).bit_count() <= self.tablebasePieces and depthLimit != self.depthLimit:
+            self.numTablebaseHits += 1
+            return self.tablebase.probe(state.AIPieces, state.humanPieces, False)
         if depthLimit == 0:
-            return state.computeHeuristic()
+            if self.quiescenceNodes:
+                self.quiescenceBudget = self.quiescenceNodes
+                return self.quiescence(state, alpha, beta, False)
+            if state.canContinue():
+                return state.computeHeuristic()
+            return state.computeUtilityValue()
+
+        # reuse the result of an earlier search of this position
+        key = state.hash
+        entry = self.transpositionTable.lookup(key)
+        ttMove = None
+        if entry is not None:
+            ttMove = entry[MOVE]
+            if entry[DEPTH] == depthLimit and depthLimit != self.depthLimit:
+                value = entry[VALUE]
+                if entry[FLAG] == EXACT \
+                        or (entry[FLAG] == LOWER_BOUND and value >= beta) \
+                        or (entry[FLAG] == UPPER_BOUND and value <= alpha):
+                    self.numTTCutoffs += 1
+                    return value
+
+        ply = self.currentDepth
+        actions = state.generateMoves(False, self.moveStack[ply])
+        if not actions:
+            # AI cannot move: game over if the human cannot either, otherwise the human moves again
+            if state.humanCanContinue():
+                return self.minValue(state, alpha, beta, depthLimit)
+            return state.computeUtilityValue()
 
         # update statistics for the search
         self.currentDepth += 1
         self.maxDepth = max(self.maxDepth, self.currentDepth)
         self.numNodes += 1
+        self.checkDeadline()
+
+        isRoot = depthLimit == self.depthLimit
+        if isRoot:
+            actions = self.moveOrderer.orderRootMoves(actions, ttMove, self.getPVMove(ply))
+            if self.rootRotation:
+                rotation = self.rootRotation % len(actions)
+                actions[:] = actions[rotation:] + actions[:rotation]
+        else:
+            actions = self.moveOrderer.orderMoves(actions, ply, ttMove, self.getPVMove(ply))
+        del self.pvTable[ply + 1][:]
 
+        alphaOrig = alpha
         v = -math.inf
-        for a in state.getActions(False):
+        best = None
+        pvs = self.searchMode == "pvs"
+        for i, a in enumerate(actions):
             # return captured checker if it is a capture move
-            captured = state.applyAction(a)
+            captured = state.makeMove(a)
             # state.printBoard()
-            if state.humanCanContinue():
+            # if the human cannot move, minValue lets the AI move again
+            if pvs and i > 0:
+                # prove with a null window that the move is no better than the best so far,
+                # and search it again with the full window if it is (values are integers,
+                # so no value lies inside the null window)
+                next = self.minValue(state, alpha, alpha + 1, depthLimit - 1)
+                if alpha < next < beta:
+                    next = self.minValue(state, alpha, beta, depthLimit - 1)
+            else:
                 next = self.minValue(state, alpha, beta, depthLimit - 1)
-            else:  # human cannot move, AI gets one more move
-                next = self.maxValue(state, alpha, beta, depthLimit - 1)
+            state.unmakeMove(a, captured)
+            self.followPV = False
             if next > v:
                 v = next
+                best = a
+                line = self.pvTable[ply]
+                del line[:]
+                line.append(a)
+                line += self.pvTable[ply + 1]
                 # Keep track of the best move so far at the top level
-                if depthLimit == self.depthLimit:
+                if isRoot:
                     self.bestMove = a
-            state.resetAction(a, captured)
+            del self.pvTable[ply + 1][:]
 
             # alpha-beta max pruning
             if v >= beta:
                 self.maxPruning += 1
-                self.currentDepth -= 1
-                return v
+                if i == 0:
+                    self.numFirstMoveCutoffs += 1
+                self.moveOrderer.recordCutoff(a, ply, depthLimit)
+                break
             alpha = max(alpha, v)
 
         self.currentDepth -= 1
+        self.transpositionTable.store(key, depthLimit, boundFlag(v, alphaOrig, beta), v, best)
 
         return v
 
     # For human player (MIN)
     def minValue(self, state, alpha, beta, depthLimit):
-        if state.terminalTest():
+        if state.AIPieces == 0 or state.humanPieces == 0:
             return state.computeUtilityValue()
+        # solved endgame
+        if (state.AIPieces | state.humanPieces).bit_count() <= self.tablebasePieces:
+            self.numTablebaseHits += 1
+            return self.tablebase.probe(state.AIPieces, state.humanPieces, True)
         if depthLimit == 0:
-            return state.computeHeuristic()
+            if self.quiescenceNodes:
+                self.quiescenceBudget = self.quiescenceNodes
+                return self.quiescence(state, alpha, beta, True)
+            if state.canContinue():
+                return state.computeHeuristic()
+            return state.computeUtilityValue()
+
+        # reuse the result of an earlier search of this position
+        key = state.hash ^ ZOBRIST_HUMAN_TURN
+        entry = self.transpositionTable.lookup(key)
+        ttMove = None
+        if entry is not None:
+            ttMove = entry[MOVE]
+            if entry[DEPTH] == depthLimit:
+                value = entry[VALUE]
+                if entry[FLAG] == EXACT \
+                        or (entry[FLAG] == LOWER_BOUND and value >= beta) \
+                        or (entry[FLAG] == UPPER_BOUND and value <= alpha):
+                    self.numTTCutoffs += 1
+                    return value
+
+        ply = self.currentDepth
+        actions = state.generateMoves(True, self.moveStack[ply])
+        if not actions:
+            # human cannot move: game over if the AI cannot either, otherwise the AI moves again
+            if state.AICanContinue():
+                return self.maxValue(state, alpha, beta, depthLimit)
+            return state.computeUtilityValue()
 
         # update statistics for the search
         self.currentDepth += 1
         self.maxDepth = max(self.maxDepth, self.currentDepth)
         self.numNodes += 1
+        self.checkDeadline()
 
+        actions = self.moveOrderer.orderMoves(actions, ply, ttMove, self.getPVMove(ply))
+        del self.pvTable[ply + 1][:]
+
+        betaOrig = beta
         v = math.inf
-        for a in state.getActions(True):
-            captured = state.applyAction(a)
-            if state.AICanContinue():
+        best = None
+        pvs = self.searchMode == "pvs"
+        for i, a in enumerate(actions):
+            captured = state.makeMove(a)
+            # if the AI cannot move, maxValue lets the human move again
+            if pvs and i > 0:
+                next = self.maxValue(state, beta - 1, beta, depthLimit - 1)
+                if alpha < next < beta:
+                    next = self.maxValue(state, alpha, beta, depthLimit - 1)
+            else:
                 next = self.maxValue(state, alpha, beta, depthLimit - 1)
-            else:  # AI cannot move, human gets one more move
-                next = self.minValue(state, alpha, beta, depthLimit - 1)
+            state.unmakeMove(a, captured)
+            self.followPV = False
             if next < v:
                 v = next
-            state.resetAction(a, captured)
+                best = a
+                line = self.pvTable[ply]
+                del line[:]
+                line.append(a)
+                line += self.pvTable[ply + 1]
+            del self.pvTable[ply + 1][:]
 
             # alpha-beta min pruning
             if v <= alpha:
                 self.minPruning += 1
-                self.currentDepth -= 1
-                return v
+                if i == 0:
+                    self.numFirstMoveCutoffs += 1
+                self.moveOrderer.recordCutoff(a, ply, depthLimit)
+                break
             beta = min(beta, v)
 
         self.currentDepth -= 1
+        self.transpositionTable.store(key, depthLimit, boundFlag(v, alpha, betaOrig), v, best)
+        return v
+
+    # Quiescence search below a leaf of the search, where humanTurn moves: as long as the player to move
+    # has to capture, search the captures (the rules leave no other choice, so there is no standing pat),
+    # and evaluate the first position without a capture. The static value in the middle of an exchange
+    # would miss the recapture. Stops searching and evaluates once the node budget of the leaf runs out.
+    def quiescence(self, state, alpha, beta, humanTurn):
+        if state.AIPieces == 0 or state.humanPieces == 0:
+            return state.computeUtilityValue()
+        ply = self.currentDepth
+        moves = state.generateCaptures(humanTurn, self.moveStack[ply])
+        if not moves or self.quiescenceBudget == 0:
+            if moves:
+                self.numQuiescenceBudgetHits += 1
+            if state.canContinue():
+                return state.computeHeuristic()
+            return state.computeUtilityValue()
+
+        self.currentDepth += 1
+        self.maxDepth = max(self.maxDepth, self.currentDepth)
+        self.numNodes += 1
+        self.numQuiescenceNodes += 1
+        self.quiescenceBudget -= 1
+        self.checkDeadline()
+
+        if humanTurn:
+            v = math.inf
+            for move in moves:
+                captured = state.makeMove(move)
+                v = min(v, self.quiescence(state, alpha, beta, False))
+                state.unmakeMove(move, captured)
+                if v <= alpha:
+                    break
+                beta = min(beta, v)
+        else:
+            v = -math.inf
+            for move in moves:
+                captured = state.makeMove(move)
+                v = max(v, self.quiescence(state, alpha, beta, True))
+                state.unmakeMove(move, captured)
+                if v >= beta:
+                    break
+                alpha = max(alpha, v)
+        self.currentDepth -= 1
         return v
 
+    # Stop the search once the deadline has passed or the search is cancelled.
+    # Only looks at the clock and the token every TIME_CHECK_INTERVAL nodes.
+    def checkDeadline(self):
+        if self.deadline is not None and self.numNodes % self.TIME_CHECK_INTERVAL == 0 \
+                and (time.perf_counter() > self.deadline or self.cancelToken.isCancelled()):
+            raise SearchTimeout()
+
+    # While the search follows the previous principal variation, return its action at this ply
+    def getPVMove(self, ply):
+        if self.followPV and ply < len(self.pv):
+            return self.pv[ply]
+        self.followPV = False
+        return None
+
+
+# Programmatic entry point: return the AI's move (oldrow, oldcol, row, col) for an 8 x 8 board,
+# where the AI's checkers are negative and the human's are positive, as in GameEngine.getBoard().
+# Keyword arguments are passed on to AIPlayer, e.g. timeLimit or workers.
+def findMove(board, difficulty=1, **options):
+    player = AIPlayer(None, difficulty, **options)
+    try:
+        return player.getNextMove(AIGameState.fromBoard(board))
+    finally:
+        player.shutdown()
+
+
+# Runs the searches of an AIPlayer on a background thread, one after the other.
+# A search can be cancelled, waited for, or given a timeout, and then returns the best move found so far.
+class SearchExecutor:
+    def __init__(self, player):
+        import concurrent.futures
+        self.player = player
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.lock = threading.Lock()
+        self.future = None
+        self.cancelToken = None
+
+    # Start searching the AI's move in the given state, by default the current position of the game.
+    # Returns a future of the move (oldrow, oldcol, row, col).
+    def submit(self, state=None):
+        with self.lock:
+            self.cancelToken = CancellationToken()
+            self.future = self.executor.submit(self.player.getNextMove, state, self.cancelToken)
+            return self.future
+
+    # Stop the current search early, its future then gets the best move found so far
+    def cancel(self):
+        with self.lock:
+            if self.cancelToken is not None:
+                self.cancelToken.cancel()
+
+    # Wait for the move of the current search. After timeout seconds the search is cancelled
+    # and its best move so far returned.
+    def join(self, timeout=None):
+        import concurrent.futures
+        future = self.future
+        if future is None:
+            return None
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            self.cancel()
+            return future.result()
+
+    # Cancel the current search and stop the thread and the AI player
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.player.shutdown(wait=False)
+
+
+# The AI player of a worker process of the parallel search, kept between tasks to reuse its tables
+workerPlayer = None
+# The shared memory of the parallel search the worker process attached to last, see AIPlayer.getSharedRoot
+workerRoot = None
+# The shared transposition table of the Lazy SMP search the worker process attached to last
+workerTable = None
+# Number of the search at the start of the shared memory, so that a worker can tell whether
+# the root it finds there is still the one a task was submitted for
+ROOT_ID = struct.Struct("<Q")
+
+
+# Attach the worker process to the shared memory of the parallel search with the given name
+def attachSharedRoot(name):
+    global workerRoot
+    if workerRoot is None or workerRoot.name != name:
+        from multiprocessing import shared_memory
+        if workerRoot is not None:
+            workerRoot.close()
+        workerRoot = shared_memory.SharedMemory(name=name)
+    return workerRoot
+
+
+# The AI player of the worker process for the given weights and tablebase, the one of the last task if they match
+def getWorkerPlayer(weights, tablebase):
+    global workerPlayer
+    if workerPlayer is None or workerPlayer.weights != weights or workerPlayer.tablebasePath != tablebase:
+        # positions searched with other weights have other values
+        if workerPlayer is not None:
+            # the shared transposition table of a Lazy SMP helper stays open for the next helper
+            if workerPlayer.transpositionTable is workerTable:
+                workerPlayer.transpositionTable = None
+            workerPlayer.shutdown()
+        workerPlayer = AIPlayer(None, 0, weights=weights, tablebase=tablebase)
+    return workerPlayer
+
+
+# Cancellation token of a worker process task of the parallel search: cancelled once the shared memory
+# of the parallel search holds another search number than the task's
+class SharedRootToken:
+    def __init__(self, sharedRoot, rootId):
+        self.sharedRoot = sharedRoot
+        self.rootId = rootId
+
+    def isCancelled(self):
+        return ROOT_ID.unpack_from(self.sharedRoot.buf, 0)[0] != self.rootId
+
+
+# Worker process task of AIPlayer.parallelAlphaBetaSearch: search one packed root move of search rootId,
+# whose root position is in the shared memory with the given name, until it is searched or the search is over.
+# Returns its value, principal variation and the search statistics.
+def searchRootAction(root, rootId, action, alpha, beta, depthLimit, timeLimit, weights, tablebase, searchMode,
+                     quiescenceNodes):
+    sharedRoot = attachSharedRoot(root)
+    token = SharedRootToken(sharedRoot, rootId)
+    if token.isCancelled():
+        # a task left over from an earlier search that nobody waits for any more
+        return None
+    state = AIGameState.fromBuffer(sharedRoot.buf, ROOT_ID.size)
+    player = getWorkerPlayer(weights, tablebase)
+    player.searchMode = searchMode
+    player.quiescenceNodes = quiescenceNodes
+    player.cancelToken = token
+    player.deadline = time.perf_counter() + timeLimit if timeLimit is not None else math.inf
+    state.weights = weights
+
+    # the previous principal variation starts with the first root action, which the parent searches itself
+    player.pv = []
+    player.startSearch(depthLimit)
+    player.currentDepth = 1
+    try:
+        v = player.searchAction(state, action, alpha, beta, depthLimit)
+    finally:
+        player.deadline = None
+    return v, [action] + player.pvTable[1], player.getSearchCounters()
+
+
+# Worker process task of AIPlayer.lazySMPSearch: search the root of search rootId to the given depth,
+# with the transposition table in the shared memory with the name table, until the search is done or stopped.
+# Returns the search statistics, None if the search was over before the task started.
+def searchHelper(root, rootId, table, ttMemory, ttReplacement, helper, depthLimit, alpha, beta, timeLimit, weights,
+                 tablebase, searchMode, quiescenceNodes):
+    global workerTable
+    sharedRoot = attachSharedRoot(root)
+    token = SharedRootToken(sharedRoot, rootId)
+    if token.isCancelled():
+        return None
+    state = AIGameState.fromBuffer(sharedRoot.buf, ROOT_ID.size)
+    player = getWorkerPlayer(weights, tablebase)
+    if workerTable is None or workerTable.name != table:
+        if workerTable is not None:
+            workerTable.close()
+        workerTable = SharedTranspositionTable(ttMemory, ttReplacement, name=table)
+    player.transpositionTable = workerTable
+    player.searchMode = searchMode
+    player.quiescenceNodes = quiescenceNodes
+    player.rootRotation = helper
+    player.cancelToken = token
+    player.deadline = time.perf_counter() + timeLimit if timeLimit is not None else math.inf
+    state.weights = weights
+
+    player.pv = []
+    try:
+        player.alphaBetaSearch(state, depthLimit, alpha, beta)
+    except SearchTimeout:
+        pass
+    finally:
+        player.deadline = None
+    return player.getSearchCounters()
+
+
+# Bound type of a value searched with the window (alpha, beta)
+def boundFlag(value, alpha, beta):
+    if value <= alpha:
+        return UPPER_BOUND
+    if value >= beta:
+        return LOWER_BOUND
+    return EXACT
+
+
+# Weights of the evaluation functions:
+# utility value = difference in # of checkers * weights[0] + # of AI checkers * weights[1]
+# heuristic value = difference in # of checkers * weights[2] + # of safe checkers * weights[3]
+#                   + # of AI checkers * weights[4]
+DEFAULT_WEIGHTS = (500, 50, 50, 10, 1)
+
+
+# Largest absolute utility or heuristic value of any position with the given weights,
+# with at most one checker on each of the 32 dark squares
+def maxAbsValue(weights):
+    return 32 * max(abs(weights[0]) + abs(weights[1]), abs(weights[2]) + abs(weights[3]) + abs(weights[4]))
+
+# Bitboard layout: bit (row * 8 + col) is set when a checker occupies (row, col).
+# AI checkers move towards higher rows (left shifts), human checkers towards lower rows (right shifts).
+BOARD_MASK = (1 << 64) - 1
+COLUMN_0 = sum(1 << (row * 8) for row in range(8))
+NOT_COLUMN_0 = BOARD_MASK & ~COLUMN_0
+NOT_COLUMN_7 = BOARD_MASK & ~(COLUMN_0 << 7)
+NOT_COLUMN_01 = NOT_COLUMN_0 & ~(COLUMN_0 << 1)
+NOT_COLUMN_67 = NOT_COLUMN_7 & ~(COLUMN_0 << 6)
+# ROWS_FROM[row] covers the given row and every row below it
+ROWS_FROM = [BOARD_MASK & ~((1 << (row * 8)) - 1) for row in range(8)]
+# Checkers only stand on the 32 dark squares, where (row + col) is odd.
+# DARK_INDEX[square] is the number of dark squares before the given square.
+DARK_SQUARES = [row * 8 + col for row in range(8) for col in range(8) if (row + col) % 2 == 1]
+DARK_INDEX = [0] * 64
+for index, square in enumerate(DARK_SQUARES):
+    DARK_INDEX[square] = index
+del index, square
+# MOVE_TABLE[oldsquare][square] is the shared [oldrow, oldcol, row, col] action between two squares
+MOVE_TABLE = [[None] * 64 for _ in range(64)]
+for oldsquare in range(64):
+    for square in range(oldsquare - 18, oldsquare + 19):
+        if 0 <= square < 64 and abs((square >> 3) - (oldsquare >> 3)) in (1, 2) \
+                and abs((square & 7) - (oldsquare & 7)) == abs((square >> 3) - (oldsquare >> 3)):
+            MOVE_TABLE[oldsquare][square] = [oldsquare >> 3, oldsquare & 7, square >> 3, square & 7]
+del oldsquare, square
+
+# Zobrist keys, one random 64-bit number per checker and square, plus one for the human player's turn.
+# Generated from a fixed seed so that hashes are the same in every process and every run.
+zobristRandom = random.Random(20240804)
+ZOBRIST_AI = [zobristRandom.getrandbits(64) for _ in range(64)]
+ZOBRIST_HUMAN = [zobristRandom.getrandbits(64) for _ in range(64)]
+ZOBRIST_HUMAN_TURN = zobristRandom.getrandbits(64)
+del zobristRandom
+
+
+# Zobrist hash of the checkers of a position, from the keys of the occupied squares only
+def positionHash(AIPieces, humanPieces):
+    hash = 0
+    while AIPieces:
+        low = AIPieces & -AIPieces
+        hash ^= ZOBRIST_AI[low.bit_length() - 1]
+        AIPieces ^= low
+    while humanPieces:
+        low = humanPieces & -humanPieces
+        hash ^= ZOBRIST_HUMAN[low.bit_length() - 1]
+        humanPieces ^= low
+    return hash
+
+
+# A snapshot of an AIGameState is the tuple (AI bitboard, human bitboard, Zobrist hash), so restoring
+# one needs no hashing. SNAPSHOT packs it into 24 bytes of any buffer: a bytearray, a memory map or
+# the shared memory that hands the root position of the parallel search to the worker processes.
+SNAPSHOT = struct.Struct("<QQQ")
+
+
+# The search works on packed moves: the move from oldsquare to square is the integer oldsquare | square << 6.
+# Everything makeMove and unmakeMove need is looked up in tables indexed by the packed move.
+def packMove(action):
+    return (action[0] * 8 + action[1]) | (action[2] * 8 + action[3]) << 6
+
+
+# MOVE_ACTIONS[move] is the shared [oldrow, oldcol, row, col] action of a packed move
+MOVE_ACTIONS = [None] * 4096
+# MOVE_BITS[move] has the start and the target square set, CAPTURE_BITS[move] the square jumped over or none
+MOVE_BITS = [0] * 4096
+CAPTURE_BITS = [0] * 4096
+# Changes of the Zobrist hash when an AI or a human checker makes the move,
+# and when the checker jumped over is an AI or a human checker
+AI_MOVE_HASH = [0] * 4096
+HUMAN_MOVE_HASH = [0] * 4096
+AI_CAPTURE_HASH = [0] * 4096
+HUMAN_CAPTURE_HASH = [0] * 4096
+for oldsquare in range(64):
+    for square in range(64):
+        action = MOVE_TABLE[oldsquare][square]
+        if action is not None:
+            move = packMove(action)
+            MOVE_ACTIONS[move] = action
+            MOVE_BITS[move] = (1 << oldsquare) | (1 << square)
+            AI_MOVE_HASH[move] = ZOBRIST_AI[oldsquare] ^ ZOBRIST_AI[square]
+            HUMAN_MOVE_HASH[move] = ZOBRIST_HUMAN[oldsquare] ^ ZOBRIST_HUMAN[square]
+            if abs(action[2] - action[0]) == 2:
+                CAPTURE_BITS[move] = 1 << ((oldsquare + square) >> 1)
+                AI_CAPTURE_HASH[move] = ZOBRIST_AI[(oldsquare + square) >> 1]
+                HUMAN_CAPTURE_HASH[move] = ZOBRIST_HUMAN[(oldsquare + square) >> 1]
+del oldsquare, square, action, move
+
+
+# The packed move of every square that a move travelling delta squares lands on, None where no such move exists
+def landingMoves(delta):
+    return [packMove(MOVE_TABLE[square - delta][square]) if 0 <= square - delta < 64
+            and MOVE_TABLE[square - delta][square] is not None else None for square in range(64)]
+
+
+# Direction tables of the move generator: the moves of each player, direction and distance by target square
+AI_LEFT_STEPS = landingMoves(7)
+AI_RIGHT_STEPS = landingMoves(9)
+AI_LEFT_JUMPS = landingMoves(14)
+AI_RIGHT_JUMPS = landingMoves(18)
+HUMAN_LEFT_STEPS = landingMoves(-9)
+HUMAN_RIGHT_STEPS = landingMoves(-7)
+HUMAN_LEFT_JUMPS = landingMoves(-18)
+HUMAN_RIGHT_JUMPS = landingMoves(-14)
+
 
 class AIGameState:
+    # weights of computeUtilityValue and computeHeuristic, AIPlayer sets those of its configuration
+    weights = DEFAULT_WEIGHTS
+
+    # The current position of a GameEngine, from the bitboards it keeps
     def __init__(self, game):
-        self.board = copy.deepcopy(game.getBoard())
+        self.setPosition(game.getPosition())
+
+    # Create a state from an 8 x 8 board with negative AI checkers and positive human checkers
+    @classmethod
+    def fromBoard(cls, board):
+        state = cls.__new__(cls)
+        state.setBoard(board)
+        return state
 
-        self.AICheckers = set(game.opponentCheckers)
-        self.humanCheckers = set(game.playerCheckers)
-        self.checkerPositions = dict(game.checkerPositions)
+    # Create a state from a position returned by getPosition
+    @classmethod
+    def fromPosition(cls, position):
+        state = cls.__new__(cls)
+        state.setPosition(position)
+        return state
+
+    # Create a state from a snapshot, see snapshot
+    @classmethod
+    def fromSnapshot(cls, snapshot):
+        state = cls.__new__(cls)
+        state.restore(snapshot)
+        return state
+
+    # Create a state from a snapshot packed into the buffer at the given offset by packSnapshot
+    @classmethod
+    def fromBuffer(cls, buffer, offset=0):
+        return cls.fromSnapshot(SNAPSHOT.unpack_from(buffer, offset))
+
+    # The position as a picklable (AI bitboard, human bitboard) tuple
+    def getPosition(self):
+        return self.AIPieces, self.humanPieces
+
+    # The position and its hash as a picklable (AI bitboard, human bitboard, Zobrist hash) tuple
+    def snapshot(self):
+        return self.AIPieces, self.humanPieces, self.hash
+
+    # Go back to a snapshot of this or any other state
+    def restore(self, snapshot):
+        self.AIPieces, self.humanPieces, self.hash = snapshot
+
+    # Write the snapshot of the state into the buffer at the given offset, SNAPSHOT.size bytes
+    def packSnapshot(self, buffer, offset=0):
+        SNAPSHOT.pack_into(buffer, offset, self.AIPieces, self.humanPieces, self.hash)
+
+    def setBoard(self, board):
+        AIPieces = 0
+        humanPieces = 0
+        for row in range(8):
+            for col in range(8):
+                if board[row][col] < 0:
+                    AIPieces |= 1 << (row * 8 + col)
+                elif board[row][col] > 0:
+                    humanPieces |= 1 << (row * 8 + col)
+        self.setPosition((AIPieces, humanPieces))
+
+    def setPosition(self, position):
+        self.AIPieces, self.humanPieces = position
+        # Zobrist hash of the checkers on the board, updated by makeMove and unmakeMove
+        self.hash = positionHash(self.AIPieces, self.humanPieces)
+
+    def numAICheckers(self):
+        return self.AIPieces.bit_count()
+
+    def numHumanCheckers(self):
+        return self.humanPieces.bit_count()
 
     # Check if the human player can continue.
     def humanCanContinue(self):
-        directions = [[-1, -1], [-1, 1], [-2, -2], [-2, 2]]
-        for checker in self.humanCheckers:
-            position = self.checkerPositions[checker]
-            for dir in directions:
-                if self.isValidMove(position[0], position[1], position[0] + dir[0], position[1] + dir[1], True):
-                    return True
-        return False
+        human = self.humanPieces
+        empty = ~(human | self.AIPieces) & BOARD_MASK
+        if ((human & NOT_COLUMN_0) >> 9 | (human & NOT_COLUMN_7) >> 7) & empty:
+            return True
+        return bool(((((human & NOT_COLUMN_01) >> 9) & self.AIPieces) >> 9
+                     | (((human & NOT_COLUMN_67) >> 7) & self.AIPieces) >> 7) & empty)
 
     # Check if the AI player can cantinue.
     def AICanContinue(self):
-        directions = [[1, -1], [1, 1], [2, -2], [2, 2]]
-        for checker in self.AICheckers:
-            position = self.checkerPositions[checker]
-            row = position[0]
-            col = position[1]
-            for dir in directions:
-                if self.isValidMove(row, col, row + dir[0], col + dir[1], False):
-                    return True
-        return False
+        ai = self.AIPieces
+        empty = ~(ai | self.humanPieces) & BOARD_MASK
+        if ((ai & NOT_COLUMN_7) << 9 | (ai & NOT_COLUMN_0) << 7) & empty:
+            return True
+        return bool(((((ai & NOT_COLUMN_67) << 9) & self.humanPieces) << 9
+                     | (((ai & NOT_COLUMN_01) << 7) & self.humanPieces) << 7) & empty)
+
+    # Check if the current player has a capture move
+    def canCapture(self, humanTurn):
+        ai = self.AIPieces
+        human = self.humanPieces
+        empty = ~(ai | human) & BOARD_MASK
+        if humanTurn:
+            return bool(((((human & NOT_COLUMN_01) >> 9) & ai) >> 9 | (((human & NOT_COLUMN_67) >> 7) & ai) >> 7)
+                        & empty)
+        return bool(((((ai & NOT_COLUMN_67) << 9) & human) << 9 | (((ai & NOT_COLUMN_01) << 7) & human) << 7) & empty)
+
+    # Check if at least one of the players can continue.
+    def canContinue(self):
+        ai = self.AIPieces
+        human = self.humanPieces
+        empty = ~(ai | human) & BOARD_MASK
+        return bool(((ai & NOT_COLUMN_7) << 9 | (ai & NOT_COLUMN_0) << 7
+                     | (human & NOT_COLUMN_0) >> 9 | (human & NOT_COLUMN_7) >> 7) & empty
+                    or ((((ai & NOT_COLUMN_67) << 9) & human) << 9 | (((ai & NOT_COLUMN_01) << 7) & human) << 7
+                        | (((human & NOT_COLUMN_01) >> 9) & ai) >> 9
+                        | (((human & NOT_COLUMN_67) >> 7) & ai) >> 7) & empty)
 
     # Neither player can can continue, thus game over
     def terminalTest(self):
-        if len(self.humanCheckers) == 0 or len(self.AICheckers) == 0:
+        if self.humanPieces == 0 or self.AIPieces == 0:
             return True
         else:
             return (not self.AICanContinue()) and (not self.humanCanContinue())
 
     # Check if current move is valid
     def isValidMove(self, oldrow, oldcol, row, col, humanTurn):
-        # invalid index
-        if oldrow < 0 or oldrow > 7 or oldcol < 0 or oldcol > 7 \
-                or row < 0 or row > 7 or col < 0 or col > 7:
-            return False
-        # No checker exists in original position
-        if self.board[oldrow][oldcol] == 0:
-            return False
-        # Another checker exists in destination position
-        if self.board[row][col] != 0:
-            return False
-
-        # human player's turn
-        if humanTurn:
-            if row - oldrow == -1:  # regular move
-                return abs(col - oldcol) == 1
-            elif row - oldrow == -2:  # capture move
-                #  \ direction or / direction
-                return (col - oldcol == -2 and self.board[row + 1][col + 1] < 0) \
-                    or (col - oldcol == 2 and self.board[row + 1][col - 1] < 0)
-            else:
-                return False
-        # opponent's turn
-        else:
-            if row - oldrow == 1:  # regular move
-                return abs(col - oldcol) == 1
-            elif row - oldrow == 2:  # capture move
-                # / direction or \ direction
-                return (col - oldcol == -2 and self.board[row - 1][col + 1] > 0) \
-                    or (col - oldcol == 2 and self.board[row - 1][col - 1] > 0)
-            else:
-                return False
+        return [oldrow, oldcol, row, col] in self.getActions(humanTurn) \
+            or [oldrow, oldcol, row, col] in self.getRegularActions(humanTurn)
 
     # compute utility value of terminal state
-    # utility value = difference in # of checkers * 500 + # of AI checkers * 50
+    # utility value = difference in # of checkers * 500 + # of AI checkers * 50 (by default)
     # utility value has larger weights so that is it preferred over heuristic values
     def computeUtilityValue(self):
-        utility = (len(self.AICheckers) - len(self.humanCheckers)) * 500 \
-                  + len(self.AICheckers) * 50
-        # print("Utility value = {0:d} :: {1:d} AI vs {2:d} Human".format(utility, len(self.AICheckers),
-        # len(self.humanCheckers)))
+        numAI = self.AIPieces.bit_count()
+        weights = self.weights
+        utility = (numAI - self.humanPieces.bit_count()) * weights[0] + numAI * weights[1]
         return utility
 
     # compute heuristic value of a non-terminal state
-    # heuristic value = diff in # of checkers * 50 + # of safe checkers * 10 + # of AI checkers
+    # heuristic value = diff in # of checkers * 50 + # of safe checkers * 10 + # of AI checkers (by default)
     def computeHeuristic(self):
-        heurisitc = (len(self.AICheckers) - len(self.humanCheckers)) * 50 \
-                    + self.countSafeAICheckers() * 10 + len(self.AICheckers)
-        # print("Heuristic value = {0:d} :: {1:d} AI vs {2:d} Human".format(heurisitc, len(self.AICheckers),
-        # len(self.humanCheckers)))
+        numAI = self.AIPieces.bit_count()
+        weights = self.weights
+        heurisitc = (numAI - self.humanPieces.bit_count()) * weights[2] \
+                    + self.countSafeAICheckers() * weights[3] + numAI * weights[4]
         return heurisitc
 
     # Count the number of safe AI checker.
-    # A safe AI checker is one checker that no opponent can capture.
+    # A safe AI checker is one checker that no opponent can capture:
+    # it sits in the leftmost column or no human checker is below its row.
     def countSafeAICheckers(self):
-        count = 0
-        for AIchecker in self.AICheckers:
-            AIrow = self.checkerPositions[AIchecker][0]
-            AIcol = self.checkerPositions[AIchecker][1]
-            safe = True
-            if not (AIcol == 0 or AIcol == len(self.board[0])):
-                # checkers near the boundaries are safe
-                for humanchecker in self.humanCheckers:
-                    if AIrow < self.checkerPositions[humanchecker][0]:
-                        safe = False
-                        break
-            if safe:
-                count += 1
-        return count
+        if self.humanPieces == 0:
+            return self.AIPieces.bit_count()
+        lowestHumanRow = (self.humanPieces.bit_length() - 1) >> 3
+        return (self.AIPieces & (COLUMN_0 | ROWS_FROM[lowestHumanRow])).bit_count()
 
     # get all possible actions for the current player
     def getActions(self, humanTurn):
+        return [MOVE_ACTIONS[move] for move in self.generateMoves(humanTurn, [])]
+
+    # get the regular (non-capture) actions for the current player
+    def getRegularActions(self, humanTurn):
+        return [MOVE_ACTIONS[move] for move in self.generateRegularMoves(humanTurn, [])]
+
+    # Fill the given list with the packed moves (see packMove) of the current player and return it.
+    # The search passes the list of the current ply of its move stack, so no list is allocated per node.
+    def generateMoves(self, humanTurn, moves):
+        # must take capture move if possible
+        if self.generateCaptures(humanTurn, moves):
+            return moves
+        return self.generateRegularMoves(humanTurn, moves)
+
+    # Fill the given list with the packed capture moves of the current player and return it
+    def generateCaptures(self, humanTurn, moves):
+        ai = self.AIPieces
+        human = self.humanPieces
+        empty = ~(ai | human) & BOARD_MASK
+        moves.clear()
         if humanTurn:
-            checkers = self.humanCheckers
-            regularDirs = [[-1, -1], [-1, 1]]
-            captureDirs = [[-2, -2], [-2, 2]]
+            appendMoves(moves, ((((human & NOT_COLUMN_01) >> 9) & ai) >> 9) & empty, HUMAN_LEFT_JUMPS)
+            appendMoves(moves, ((((human & NOT_COLUMN_67) >> 7) & ai) >> 7) & empty, HUMAN_RIGHT_JUMPS)
         else:
-            checkers = self.AICheckers
-            regularDirs = [[1, -1], [1, 1]]
-            captureDirs = [[2, -2], [2, 2]]
-
-        regularMoves = []
-        captureMoves = []
-        for checker in checkers:
-            oldrow = self.checkerPositions[checker][0]
-            oldcol = self.checkerPositions[checker][1]
-            for dir in regularDirs:
-                if self.isValidMove(oldrow, oldcol, oldrow + dir[0], oldcol + dir[1], humanTurn):
-                    regularMoves.append([oldrow, oldcol, oldrow + dir[0], oldcol + dir[1]])
-            for dir in captureDirs:
-                if self.isValidMove(oldrow, oldcol, oldrow + dir[0], oldcol + dir[1], humanTurn):
-                    captureMoves.append([oldrow, oldcol, oldrow + dir[0], oldcol + dir[1]])
+            appendMoves(moves, ((((ai & NOT_COLUMN_01) << 7) & human) << 7) & empty, AI_LEFT_JUMPS)
+            appendMoves(moves, ((((ai & NOT_COLUMN_67) << 9) & human) << 9) & empty, AI_RIGHT_JUMPS)
+        return moves
 
-        # must take capture move if possible
-        if captureMoves:
-            return captureMoves
+    # Fill the given list with the packed regular (non-capture) moves of the current player and return it
+    def generateRegularMoves(self, humanTurn, moves):
+        empty = ~(self.AIPieces | self.humanPieces) & BOARD_MASK
+        moves.clear()
+        if humanTurn:
+            human = self.humanPieces
+            appendMoves(moves, ((human & NOT_COLUMN_0) >> 9) & empty, HUMAN_LEFT_STEPS)
+            appendMoves(moves, ((human & NOT_COLUMN_7) >> 7) & empty, HUMAN_RIGHT_STEPS)
         else:
-            return regularMoves
+            ai = self.AIPieces
+            appendMoves(moves, ((ai & NOT_COLUMN_0) << 7) & empty, AI_LEFT_STEPS)
+            appendMoves(moves, ((ai & NOT_COLUMN_7) << 9) & empty, AI_RIGHT_STEPS)
+        return moves
 
     # Apply given action to the game board.
     # :param action: [oldrow, oldcol, newrow, newcol]
-    # :return: the label of the captured checker. 0 if none.
+    # :return: the bit of the captured checker. 0 if none.
     def applyAction(self, action):
-        oldrow = action[0]
-        oldcol = action[1]
-        row = action[2]
-        col = action[3]
-        captured = 0
-
-        # move the checker
-        toMove = self.board[oldrow][oldcol]
-        self.checkerPositions[toMove] = (row, col)
-        self.board[row][col] = toMove
-        self.board[oldrow][oldcol] = 0
-
-        # capture move, remove captured checker
-        if abs(oldrow - row) == 2:
-            captured = self.board[(oldrow + row) // 2][(oldcol + col) // 2]
-            if captured > 0:
-                self.humanCheckers.remove(captured)
-            else:
-                self.AICheckers.remove(captured)
-            self.board[(oldrow + row) // 2][(oldcol + col) // 2] = 0
-            self.checkerPositions.pop(captured, None)
-
-        return captured
+        return self.makeMove(packMove(action))
 
     # Reset given action to the game board. Restored captured checker if any.
     # param action: [oldrow, oldcol, newrow, newcol]
-    # return: the label of the captured checker. 0 if none.
+    # param captured: the bit returned by applyAction
     def resetAction(self, action, captured):
-        oldrow = action[0]
-        oldcol = action[1]
-        row = action[2]
-        col = action[3]
-
-        # move the checker
-        toMove = self.board[row][col]
-        self.checkerPositions[toMove] = (oldrow, oldcol)
-        self.board[oldrow][oldcol] = toMove
-        self.board[row][col] = 0
-
-        # capture move, remove captured checker
-        if abs(oldrow - row) == 2:
-            if captured > 0:
-                self.humanCheckers.add(captured)
-            else:
-                self.AICheckers.add(captured)
-            self.board[(oldrow + row) // 2][(oldcol + col) // 2] = captured
-            self.checkerPositions[captured] = ((oldrow + row) // 2, (oldcol + col) // 2)
+        self.unmakeMove(packMove(action), captured)
+
+    # Apply a packed move. Everything it changes comes from the tables of the move.
+    # Returns the bit of the captured checker, 0 if none.
+    def makeMove(self, move):
+        moved = MOVE_BITS[move]
+        captured = CAPTURE_BITS[move]
+        # the start square is taken and the target square is empty, so this tests the start square
+        if self.AIPieces & moved:
+            self.AIPieces ^= moved
+            self.hash ^= AI_MOVE_HASH[move]
+            if captured:
+                self.humanPieces ^= captured
+                self.hash ^= HUMAN_CAPTURE_HASH[move]
+        else:
+            self.humanPieces ^= moved
+            self.hash ^= HUMAN_MOVE_HASH[move]
+            if captured:
+                self.AIPieces ^= captured
+                self.hash ^= AI_CAPTURE_HASH[move]
+        return captured
+
+    # Take back a packed move applied by makeMove, which returned captured
+    def unmakeMove(self, move, captured):
+        moved = MOVE_BITS[move]
+        # now the target square is taken and the start square is empty
+        if self.AIPieces & moved:
+            self.AIPieces ^= moved
+            self.hash ^= AI_MOVE_HASH[move]
+            if captured:
+                self.humanPieces |= captured
+                self.hash ^= HUMAN_CAPTURE_HASH[move]
+        else:
+            self.humanPieces ^= moved
+            self.hash ^= HUMAN_MOVE_HASH[move]
+            if captured:
+                self.AIPieces |= captured
+                self.hash ^= AI_CAPTURE_HASH[move]
 
     def printBoard(self):
-        for i in range(len(self.board)):
-            for j in range(len(self.board[i])):
-                check = self.board[i][j]
-                if (check < 0):
-                    print(check, end=' ')
+        for i in range(8):
+            for j in range(8):
+                if self.AIPieces >> (i * 8 + j) & 1:
+                    print(-1, end=' ')
+                elif self.humanPieces >> (i * 8 + j) & 1:
+                    print(' 1', end=' ')
                 else:
-                    print(' ' + str(check), end=' ')
+                    print(' 0', end=' ')
 
             print()
         print('------------------------')
+
+
+# Append the packed moves landing on each bit of targets, where landingMoves[square] is the move landing on square
+def appendMoves(moves, targets, landingMoves):
+    while targets:
+        low = targets & -targets
+        moves.append(landingMoves[low.bit_length() - 1])
+        targets ^= low
@@ -0,0 +1,99 @@
+import numpy as np  # NumPy is only needed for batch evaluation, the game itself runs without it
+from AIPlayer import DEFAULT_WEIGHTS, COLUMN_0, NOT_COLUMN_0, NOT_COLUMN_7, NOT_COLUMN_01, NOT_COLUMN_67
+
+# Evaluates many positions at once. A batch of N positions is a pair of uint64 arrays of length N,
+# the AI and the human bitboards as in AIGameState, and every function works on the bitboards with
+# shifts, masks and bit counts like the AIGameState method of the same name, with the same values
+# for the same evaluation weights (see AIPlayer.DEFAULT_WEIGHTS).
+# Unpacking the bitboards into boards of 64 squares would cost more than the evaluation itself.
+
+COLUMN_0_MASK = np.uint64(COLUMN_0)
+NOT_COLUMN_0_MASK = np.uint64(NOT_COLUMN_0)
+NOT_COLUMN_7_MASK = np.uint64(NOT_COLUMN_7)
+NOT_COLUMN_01_MASK = np.uint64(NOT_COLUMN_01)
+NOT_COLUMN_67_MASK = np.uint64(NOT_COLUMN_67)
+# shift distances as uint64, so that NumPy keeps the bitboards unsigned
+SHIFT_7 = np.uint64(7)
+SHIFT_9 = np.uint64(9)
+SHIFT_ROW = np.uint64(8)
+
+
+# Stack the boards of the given game states (anything with getBoard()) or 8 x 8 lists
+def stackBoards(boards):
+    return np.array([board.getBoard() if hasattr(board, "getBoard") else board for board in boards],
+                    dtype=np.int8).reshape(-1, 8, 8)
+
+
+# Convert an (N, 8, 8) batch of boards with negative AI checkers and positive human checkers,
+# as in GameEngine.getBoard(), to the AI and human bitboards
+def bitboardsFromBoards(boards):
+    boards = np.asarray(boards).reshape(-1, 64)
+    AIPieces = np.packbits(boards < 0, axis=1, bitorder="little").view("<u8").reshape(-1)
+    humanPieces = np.packbits(boards > 0, axis=1, bitorder="little").view("<u8").reshape(-1)
+    return AIPieces.astype(np.uint64), humanPieces.astype(np.uint64)
+
+
+# utility value = difference in # of checkers * 500 + # of AI checkers * 50 (by default)
+def computeUtilityValues(AIPieces, humanPieces, weights=DEFAULT_WEIGHTS):
+    numAI = np.bitwise_count(AIPieces).astype(np.int64)
+    numHuman = np.bitwise_count(humanPieces).astype(np.int64)
+    return (numAI - numHuman) * weights[0] + numAI * weights[1]
+
+
+# heuristic value = diff in # of checkers * 50 + # of safe checkers * 10 + # of AI checkers (by default)
+def computeHeuristics(AIPieces, humanPieces, weights=DEFAULT_WEIGHTS):
+    numAI = np.bitwise_count(AIPieces).astype(np.int64)
+    numHuman = np.bitwise_count(humanPieces).astype(np.int64)
+    return (numAI - numHuman) * weights[2] + countSafeAICheckers(AIPieces, humanPieces) * weights[3] \
+        + numAI * weights[4]
+
+
+# Count the safe AI checkers of every position: checkers in the leftmost column,
+# or on or below the row of the lowest human checker
+def countSafeAICheckers(AIPieces, humanPieces):
+    # row of the highest set bit of the human bitboard, found by halving (0 without human checkers)
+    lowestHumanRow = np.zeros(len(humanPieces), dtype=np.uint64)
+    rest = humanPieces
+    for rows in (4, 2, 1):
+        shift = np.uint64(rows * 8)
+        upper = rest >> shift
+        found = upper != 0
+        rest = np.where(found, upper, rest)
+        lowestHumanRow += found * np.uint64(rows)
+    rowsFrom = ~np.uint64(0) << (lowestHumanRow * SHIFT_ROW)
+    return np.bitwise_count(AIPieces & (COLUMN_0_MASK | rowsFrom)).astype(np.int64)
+
+
+# Check for every position whether at least one of the players has a legal move
+def canContinue(AIPieces, humanPieces):
+    empty = ~(AIPieces | humanPieces)
+    steps = ((AIPieces & NOT_COLUMN_7_MASK) << SHIFT_9 | (AIPieces & NOT_COLUMN_0_MASK) << SHIFT_7
+             | (humanPieces & NOT_COLUMN_0_MASK) >> SHIFT_9 | (humanPieces & NOT_COLUMN_7_MASK) >> SHIFT_7)
+    jumps = ((((AIPieces & NOT_COLUMN_67_MASK) << SHIFT_9) & humanPieces) << SHIFT_9
+             | (((AIPieces & NOT_COLUMN_01_MASK) << SHIFT_7) & humanPieces) << SHIFT_7
+             | (((humanPieces & NOT_COLUMN_01_MASK) >> SHIFT_9) & AIPieces) >> SHIFT_9
+             | (((humanPieces & NOT_COLUMN_67_MASK) >> SHIFT_7) & AIPieces) >> SHIFT_7)
+    return ((steps | jumps) & empty) != 0
+
+
+# Check for every position whether the game is over
+def terminalTest(AIPieces, humanPieces):
+    return (AIPieces == 0) | (humanPieces == 0) | ~canContinue(AIPieces, humanPieces)
+
+
+# Value of every position at the search depth limit: the utility value of terminal positions,
+# the heuristic value of all others
+def evaluatePositions(AIPieces, humanPieces, weights=DEFAULT_WEIGHTS):
+    return np.where(terminalTest(AIPieces, humanPieces), computeUtilityValues(AIPieces, humanPieces, weights),
+                    computeHeuristics(AIPieces, humanPieces, weights))
+
+
+# evaluatePositions for an (N, 8, 8) batch of boards
+def evaluateBoards(boards, weights=DEFAULT_WEIGHTS):
+    return evaluatePositions(*bitboardsFromBoards(boards), weights)
+
+
+# evaluatePositions for sequences of AI and human bitboards as Python ints, returned as a list of ints
+def evaluateBitboards(AIPieces, humanPieces, weights=DEFAULT_WEIGHTS):
+    return evaluatePositions(np.array(AIPieces, dtype=np.uint64), np.array(humanPieces, dtype=np.uint64),
+                             weights).tolist()
@@ -1,9 +1,14 @@
+import queue  # to pass board changes to the Tk thread
 import tkinter
 from CheckerGame import *
 from tkinter.font import Font
 
 
 class BoardGUI:
+    # A moving checker is drawn this many times, this many milliseconds apart
+    ANIMATION_STEPS = 10
+    ANIMATION_DELAY = 15
+
     def __init__(self, game):
         self.game = game
         self.ROWS = 8
@@ -20,7 +25,11 @@ class BoardGUI:
                                 borderwidth=5, background='white')
         self.c.pack()
         self.board = [[0] * self.COLS for _ in range(self.ROWS)]
-        self.tiles = [[None for _ in range(self.COLS)] for _ in range(self.ROWS)]
+        # checkerItems[label] is the canvas oval of the checker with that label. The ovals are created once
+        # and then moved, recolored and hidden, so the number of canvas items never grows.
+        self.checkerItems = {}
+        # animations[item] = [start coordinates, end coordinates, steps done] of a moving checker
+        self.animations = {}
 
         # Print dark square
         for i in range(8):
@@ -36,7 +45,8 @@ class BoardGUI:
             self.c.create_line(self.col_width * i, 0, self.col_width * i, self.WINDOW_HEIGHT, width=2)
 
         # Place checks on the board
-        self.updateBoard()
+        board = self.game.getBoard()
+        self.updateSquares([(i, j, board[i][j]) for i in range(self.ROWS) for j in range(self.COLS)], animate=False)
 
         # Initialize parameters
         self.checkerSelected = False
@@ -45,8 +55,10 @@ class BoardGUI:
         # Register callback function for mouse clicks
         self.c.bind("<Button-1>", self.processClick)
 
-        # make GUI updates board every second
-        self.root.after(1000, self.updateBoard)
+        # Board changes of other threads are queued, and the <<BoardChanged>> event makes
+        # the Tk thread draw them as soon as they arrive
+        self.boardEvents = queue.Queue()
+        self.root.bind("<<BoardChanged>>", self.drawBoardChanges)
 
         self.rules_button = tkinter.Button(self.root, text="Show Rules", command=self.show_rules)
         self.rules_button.pack(side=tkinter.BOTTOM)
@@ -143,6 +155,8 @@ class BoardGUI:
         win.geometry('{}x{}+{}+{}'.format(width, height, x, y))
 
     def startGUI(self):
+        # draw the changes made before the main loop started
+        self.root.after_idle(self.drawBoardChanges)
         self.root.mainloop()
 
     def pauseGUI(self):
@@ -151,39 +165,84 @@ class BoardGUI:
     def resumeGUI(self):
         self.c.bind("<Button-1>", self.processClick)
 
-    # Update the positions of checkers
-    def updateBoard(self):
-        if self.game.isBoardUpdated():
-            newBoard = self.game.getBoard()
-            for i in range(len(self.board)):
-                for j in range(len(self.board[0])):
-                    if self.board[i][j] != newBoard[i][j]:
-                        self.board[i][j] = newBoard[i][j]
-                        self.c.delete(self.tiles[i][j])
-                        self.tiles[i][j] = None
-
-                        # choose different color for different player's checkers
-                        if newBoard[i][j] < 0:
-                            self.tiles[i][j] = self.c.create_oval(j * self.col_width + 10, i * self.row_height + 10,
-                                                                  (j + 1) * self.col_width - 10,
-                                                                  (i + 1) * self.row_height - 10,
-                                                                  fill="green")
-                        elif newBoard[i][j] > 0:
-                            self.tiles[i][j] = self.c.create_oval(j * self.col_width + 10, i * self.row_height + 10,
-                                                                  (j + 1) * self.col_width - 10,
-                                                                  (i + 1) * self.row_height - 10,
-                                                                  fill="red")
-                        else:  # no checker
-                            continue
-
-                        # raise the tiles to highest layer
-                        self.c.tag_raise(self.tiles[i][j])
-
-            # tell game logic that GUI has updated the board
-            self.game.completeBoardUpdate()
-
-        # make GUI updates board every second
-        self.root.after(1000, self.updateBoard)
+    # Called by the game from any thread with the (row, col, label) of the squares that changed.
+    # The changes are drawn on the Tk thread.
+    def boardChanged(self, changes):
+        self.boardEvents.put(changes)
+        try:
+            self.root.event_generate("<<BoardChanged>>", when="tail")
+        except (RuntimeError, tkinter.TclError):
+            # the main loop has not started yet (startGUI draws the changes) or the window is closed
+            pass
+
+    # Draw all queued board changes, in the order they were made
+    def drawBoardChanges(self, event=None):
+        while True:
+            try:
+                changes = self.boardEvents.get_nowait()
+            except queue.Empty:
+                return
+            self.updateSquares(changes)
+
+    # Update the checkers of the given (row, col, label) squares:
+    # checkers that arrive on a square move there, checkers that left the board are hidden
+    def updateSquares(self, changes, animate=True):
+        arrived = set(label for i, j, label in changes if label != 0)
+        for i, j, label in changes:
+            old = self.board[i][j]
+            if old == label:
+                continue
+            self.board[i][j] = label
+            if old != 0 and old not in arrived:  # captured
+                self.c.itemconfig(self.getCheckerItem(old), state=tkinter.HIDDEN)
+            if label != 0:
+                self.moveChecker(label, i, j, animate)
+
+    # The canvas oval of the checker with the given label, created hidden the first time
+    def getCheckerItem(self, label):
+        item = self.checkerItems.get(label)
+        if item is None:
+            item = self.c.create_oval(0, 0, 0, 0, fill=self.getCheckerColor(label), state=tkinter.HIDDEN)
+            self.checkerItems[label] = item
+        return item
+
+    # choose different color for different player's checkers
+    def getCheckerColor(self, label):
+        return "green" if label < 0 else "red"
+
+    # Coordinates of a checker's oval on the given square
+    def getSquareCoords(self, row, col):
+        return [col * self.col_width + 10, row * self.row_height + 10,
+                (col + 1) * self.col_width - 10, (row + 1) * self.row_height - 10]
+
+    # Move the checker with the given label to the given square, sliding it there if it is on the board
+    def moveChecker(self, label, row, col, animate=True):
+        item = self.getCheckerItem(label)
+        end = self.getSquareCoords(row, col)
+        # raise the checker to highest layer
+        self.c.tag_raise(item)
+        if not animate or self.c.itemcget(item, "state") == tkinter.HIDDEN:
+            self.animations.pop(item, None)
+            self.c.coords(item, *end)
+            self.c.itemconfig(item, state=tkinter.NORMAL)
+            return
+        # a new animation replaces one that is still running, which then stops
+        animation = [self.c.coords(item), end, 0]
+        self.animations[item] = animation
+        self.root.after(self.ANIMATION_DELAY, self.animateChecker, item, animation)
+
+    # Draw the next step of a checker's animation
+    def animateChecker(self, item, animation):
+        if self.animations.get(item) is not animation:
+            return
+        start, end, step = animation
+        animation[2] = step = step + 1
+        fraction = step / self.ANIMATION_STEPS
+        self.c.coords(item, *[a + (b - a) * fraction for a, b in zip(start, end)])
+        if step < self.ANIMATION_STEPS:
+            self.root.after(self.ANIMATION_DELAY, self.animateChecker, item, animation)
+        else:
+            del self.animations[item]
 
     # this function checks if the checker belongs to the current player
     # if isPlayerTurn() returns True, then it is player's turn and only
@@ -203,14 +262,10 @@ class BoardGUI:
             if self.board[row][col] != 0 and self.isCurrentPlayerChecker(row, col):
                 self.clickData["row"] = row
                 self.clickData["col"] = col
-                self.clickData["color"] = self.c.itemcget(self.tiles[row][col], 'fill')
-
-                # replace clicked checker with a temporary checker
-                self.c.delete(self.tiles[row][col])
-                self.tiles[row][col] = self.c.create_oval(col * self.col_width + 10, row * self.row_height + 10,
-                                                          (col + 1) * self.col_width - 10,
-                                                          (row + 1) * self.row_height - 10,
-                                                          fill="yellow")
+                self.clickData["checker"] = self.board[row][col]
+
+                # highlight the clicked checker
+                self.c.itemconfig(self.getCheckerItem(self.board[row][col]), fill="yellow")
                 self.checkerSelected = True
 
             else:  # no checker at the clicked postion
@@ -218,13 +273,8 @@ class BoardGUI:
 
         else:  # There is a checker being selected
             # First reset the board
-            oldrow = self.clickData["row"]
-            oldcol = self.clickData["col"]
-            self.c.delete(self.tiles[oldrow][oldcol])
-            self.tiles[oldrow][oldcol] = self.c.create_oval(oldcol * self.col_width + 10, oldrow * self.row_height + 10,
-                                                            (oldcol + 1) * self.col_width - 10,
-                                                            (oldrow + 1) * self.row_height - 10,
-                                                            fill=self.clickData["color"])
+            checker = self.clickData["checker"]
+            self.c.itemconfig(self.getCheckerItem(checker), fill=self.getCheckerColor(checker))
 
             # If the destination leads to a legal move
             self.game.move(self.clickData["row"], self.clickData["col"], row, col)
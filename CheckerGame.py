@@ -1,26 +1,34 @@
-import _thread
+import sys  # for the error output
+import traceback  # to print the errors of the search
 from BoardGUI import *
 from AIPlayer import *
+from GameEngine import GameEngine
 
 
-class CheckerGame:
+# Interactive front-end: asks for the game settings on the command line,
+# shows the board in a BoardGUI and lets the AIPlayer answer the player's moves.
+class CheckerGame(GameEngine):
     def __init__(self):
-        self.opponentCheckers = None
-        self.playerCheckers = None
         self.root = None
-        self.lock = _thread.allocate_lock()
-        self.board = self.initBoard()
-        self.playerTurn = self.whoGoFirst()
+        self.shuttingDown = False
+        GameEngine.__init__(self, self.whoGoFirst())
         self.difficulty = self.getDifficulty()
-        self.AIPlayer = AIPlayer(self, self.difficulty)
+        self.AIPlayer = AIPlayer(self, self.difficulty, ponder=True)
+        self.AIPlayer.addObserver(self.printSearchStats)
+        # runs the AI's searches on a background thread
+        self.searchExecutor = SearchExecutor(self.AIPlayer)
         self.GUI = BoardGUI(self)
 
         # AI goes first
         if not self.isPlayerTurn():
-            _thread.start_new_thread(self.AIMakeMove, ())
+            self.AIMakeMove()
 
         self.GUI.startGUI()
 
+    # Show the statistics of the AI's search of every move on the command line
+    def printSearchStats(self, stats):
+        print(stats.summary())
+
     # Let player decide to go first or second
     def whoGoFirst(self):
         ans = input("Do you want to go first? (Y/N) ")
@@ -34,77 +42,21 @@ class CheckerGame:
             ans = eval(input("What level of difficulty? (1-Easy, 2-Hard) "))
         return ans
 
-    # This function initializes the game board.
-    def initBoard(self):
-        board = [[0] * 8 for _ in range(8)]  # Change board size
-        self.playerCheckers = set()
-        self.opponentCheckers = set()
-        self.checkerPositions = {}
-        # Setting up checkers for an 8x8 board (3 rows each side)
-        for i in range(8):
-            if i < 3 or i > 4:  # Only populate 3 rows at the top and bottom
-                for j in range(8):
-                    if (i + j) % 2 == 1:
-                        if i < 3:
-                            board[i][j] = -(len(self.opponentCheckers) + 1)
-                            self.opponentCheckers.add(board[i][j])
-                            self.checkerPositions[board[i][j]] = (i, j)
-                        else:
-                            board[i][j] = len(self.playerCheckers) + 1
-                            self.playerCheckers.add(board[i][j])
-                            self.checkerPositions[board[i][j]] = (i, j)
-        self.boardUpdated = True
-        return board
-
-    def getBoard(self):
-        return self.board
-
-    def printBoard(self):
-        for i in range(len(self.board)):
-            for j in range(len(self.board[i])):
-                check = self.board[i][j]
-                if check < 0:
-                    print(check, end=' ')
-                else:
-                    print(' ' + str(check), end=' ')
-
-            print()
-
-    def isBoardUpdated(self):
-        return self.boardUpdated
-
-    def setBoardUpdated(self):
-        self.lock.acquire()
-        self.boardUpdated = True
-        self.lock.release()
-
-    def completeBoardUpdate(self):
-        self.lock.acquire()
-        self.boardUpdated = False
-        self.lock.release()
-
-    def isPlayerTurn(self):
-        return self.playerTurn
-
-    # Switch turns between player and opponent.
-    # If one of them has no legal moves, the other can keep playing
-    def changePlayerTurn(self):
-        if self.playerTurn and self.opponentCanContinue():
-            self.playerTurn = False
-        elif not self.playerTurn and self.playerCanContinue():
-            self.playerTurn = True
+    # let the GUI know it has to redraw the changed squares
+    def boardChanged(self, changes):
+        self.GUI.boardChanged(changes)
 
     # apply the given move in the game
     def move(self, oldrow, oldcol, row, col):
-        if not self.isValidMove(oldrow, oldcol, row, col, self.playerTurn):
-            return
-
-        # human player can only choose from the possible actions
-        if self.playerTurn and not ([oldrow, oldcol, row, col] in self.getPossiblePlayerActions()):
+        # both players can only choose from the possible actions
+        if not self.isLegalMove(oldrow, oldcol, row, col):
             return
 
+        # the player has moved, the AI stops thinking about the player's possible moves
+        if self.playerTurn:
+            self.AIPlayer.stopPondering()
         self.makeMove(oldrow, oldcol, row, col)
-        _thread.start_new_thread(self.next, ())
+        self.next()
 
     # update game state
     def next(self):
@@ -118,121 +70,30 @@ class CheckerGame:
             self.AIMakeMove()
 
     # Temporarily Pause GUI and ask AI player to make next move.
+    # The search runs on the thread of the search executor, which makes the move when it is done.
     def AIMakeMove(self):
         self.GUI.pauseGUI()
-        oldrow, oldcol, row, col = self.AIPlayer.getNextMove()
-        self.move(oldrow, oldcol, row, col)
-        self.GUI.resumeGUI()
-
-    # update checker position
-    def makeMove(self, oldrow, oldcol, row, col):
-        toMove = self.board[oldrow][oldcol]
-        self.checkerPositions[toMove] = (row, col)
+        self.searchExecutor.submit().add_done_callback(self.AIMoveFound)
 
-        # move the checker
-        self.board[row][col] = self.board[oldrow][oldcol]
-        self.board[oldrow][oldcol] = 0
-
-        # capture move, remove captured checker
-        if abs(oldrow - row) == 2:
-            toRemove = self.board[(oldrow + row) // 2][(oldcol + col) // 2]
-            if toRemove > 0:
-                self.playerCheckers.remove(toRemove)
-            else:
-                self.opponentCheckers.remove(toRemove)
-            self.board[(oldrow + row) // 2][(oldcol + col) // 2] = 0
-            self.checkerPositions.pop(toRemove, None)
-
-        self.setBoardUpdated()
-
-    # Get all possible moves for the current player
-    def getPossiblePlayerActions(self):
-        checkers = self.playerCheckers
-        regularDirs = [[-1, -1], [-1, 1]]
-        captureDirs = [[-2, -2], [-2, 2]]
-
-        regularMoves = []
-        captureMoves = []
-        for checker in checkers:
-            oldrow = self.checkerPositions[checker][0]
-            oldcol = self.checkerPositions[checker][1]
-            for dir in regularDirs:
-                if self.isValidMove(oldrow, oldcol, oldrow + dir[0], oldcol + dir[1], True):
-                    regularMoves.append([oldrow, oldcol, oldrow + dir[0], oldcol + dir[1]])
-            for dir in captureDirs:
-                if self.isValidMove(oldrow, oldcol, oldrow + dir[0], oldcol + dir[1], True):
-                    captureMoves.append([oldrow, oldcol, oldrow + dir[0], oldcol + dir[1]])
-
-        # must take capture move if possible
-        if captureMoves:
-            return captureMoves
-        else:
-            return regularMoves
-
-    # check if the given move if valid for the current player
-    def isValidMove(self, oldrow, oldcol, row, col, playerTurn):
-        # invalid index
-        if oldrow < 0 or oldrow > 7 or oldcol < 0 or oldcol > 7 \
-                or row < 0 or row > 7 or col < 0 or col > 7:
-            return False
-        # No checker exists in original position
-        if self.board[oldrow][oldcol] == 0:
-            return False
-        # Another checker exists in destination position
-        if self.board[row][col] != 0:
-            return False
-
-        # player's turn
-        if playerTurn:
-            if row - oldrow == -1:  # regular move
-                return abs(col - oldcol) == 1
-            elif row - oldrow == -2:  # capture move
-                #  \ direction or / direction
-                return (col - oldcol == -2 and self.board[row + 1][col + 1] < 0) \
-                    or (col - oldcol == 2 and self.board[row + 1][col - 1] < 0)
-            else:
-                return False
-        # opponent's turn
-        else:
-            if row - oldrow == 1:  # regular move
-                return abs(col - oldcol) == 1
-            elif row - oldrow == 2:  # capture move
-                # / direction or \ direction
-                return (col - oldcol == -2 and self.board[row - 1][col + 1] > 0) \
-                    or (col - oldcol == 2 and self.board[row - 1][col - 1] > 0)
-            else:
-                return False
-
-    # Check if the player can continue
-    def playerCanContinue(self):
-        directions = [[-1, -1], [-1, 1], [-2, -2], [-2, 2]]
-        for checker in self.playerCheckers:
-            position = self.checkerPositions[checker]
-            row = position[0]
-            col = position[1]
-            for dir in directions:
-                if self.isValidMove(row, col, row + dir[0], col + dir[1], True):
-                    return True
-        return False
-
-    # Check whether opponent can continue
-    def opponentCanContinue(self):
-        directions = [[1, -1], [1, 1], [2, -2], [2, 2]]
-        for checker in self.opponentCheckers:
-            position = self.checkerPositions[checker]
-            row = position[0]
-            col = position[1]
-            for dir in directions:
-                if self.isValidMove(row, col, row + dir[0], col + dir[1], False):
-                    return True
-        return False
-
-    # Neither player can can continue, thus game over
-    def isGameOver(self):
-        if len(self.playerCheckers) == 0 or len(self.opponentCheckers) == 0:
-            return True
-        else:
-            return (not self.playerCanContinue()) and (not self.opponentCanContinue())
+    # Make the move found by the AI player, unless the game was shut down in the meantime
+    def AIMoveFound(self, future):
+        if future.cancelled() or self.shuttingDown:
+            return
+        error = future.exception()
+        if error is not None:
+            # report the failed search and unpause the board instead of leaving it frozen,
+            # the player can then make the AI's move
+            print("The AI player failed to find a move:", file=sys.stderr)
+            traceback.print_exception(error)
+            self.GUI.resumeGUI()
+            return
+        oldrow, oldcol, row, col = future.result()
+        self.move(oldrow, oldcol, row, col)
+        # If the player cannot move, the AI is already searching its next move, and after the last move
+        # the game is over. Otherwise think about the player's possible moves while the player thinks.
+        if self.playerTurn and not self.isGameOver():
+            self.AIPlayer.startPondering(AIGameState(self))
+            self.GUI.resumeGUI()
 
     def shutdown(self):
         # Add logic to close the GUI and any other resources
@@ -244,18 +105,13 @@ class CheckerGame:
             print(f"Failed to close the GUI properly: {e}")
 
         try:
-            pass
+            # cancel the AI's search and pondering, and stop their threads
+            self.shuttingDown = True
+            self.searchExecutor.shutdown()
         except Exception as e:
             print(f"Failed to cleanly close all threads: {e}")
 
     def getGameSummary(self):
         self.GUI.pauseGUI()
         print("Game Over!")
-        playerNum = len(self.playerCheckers)
-        opponentNum = len(self.opponentCheckers)
-        if (playerNum > opponentNum):
-            print("Player won by {0:d} checkers! Congratulation!".format(playerNum - opponentNum))
-        elif (playerNum < opponentNum):
-            print("Computer won by {0:d} checkers! Try again!".format(opponentNum - playerNum))
-        else:
-            print("It is a draw! Try again!")
+        print(GameEngine.getGameSummary(self))
@@ -0,0 +1,227 @@
+import argparse  # for the command line options
+import heapq  # to keep the worst blunders
+import math  # for the search window
+import os  # for the number of CPUs
+import sys  # for the exit status
+import time  # to report the analysis time
+import concurrent.futures  # to analyze shards in parallel
+from AIPlayer import AIPlayer, DEFAULT_WEIGHTS
+from GameRecord import GameRecordReader, HEADER
+
+# Streaming analysis of game record files (see GameRecord.py).
+#
+# The analysis is a pipeline of generators: iterGames reads one game at a time from the memory-mapped file,
+# iterPositions replays it through AIGameState and yields every position with the move played in it, and
+# analyzePositions searches each position to a small depth and yields the value lost by the move played.
+# AnalysisStats only keeps counters and the worst few blunders, so memory stays the same however large
+# the file is. A file is split into shards, ranges of file offsets analyzed by separate processes, and
+# the statistics of the shards are merged at the end.
+
+
+# Yield (game index, GameRecord) for the games of the record file that start in [startOffset, endOffset)
+def iterGames(path, startOffset=0, endOffset=None):
+    with GameRecordReader(path) as reader:
+        first = reader.findGame(startOffset)
+        last = reader.count if endOffset is None else reader.findGame(endOffset)
+        yield from reader.iterGames(first, last)
+
+
+# Replay the games and yield (game index, ply, state, humanTurn, action) for every move,
+# where state is the AIGameState before the move. The state is only valid until the next position is yielded.
+def iterPositions(games):
+    for gameIndex, game in games:
+        for ply, (state, humanTurn, action) in enumerate(game.replay()):
+            yield gameIndex, ply, state, humanTurn, action
+
+
+# Search every position to depthLimit and yield (game index, ply, humanTurn, action, number of legal moves,
+# value of the move played, best value, best move). Values are those of the AI player's search,
+# so the AI maximizes them and the human minimizes them.
+def analyzePositions(positions, player, depthLimit):
+    for gameIndex, ply, state, humanTurn, action in positions:
+        state.weights = player.weights
+        actions = state.getActions(humanTurn)
+        if len(actions) == 1:
+            # a forced move cannot be a mistake
+            yield gameIndex, ply, humanTurn, action, 1, None, None, action
+            continue
+        value, bestValue, bestMove = searchMoves(player, state, humanTurn, action, actions, depthLimit)
+        yield gameIndex, ply, humanTurn, action, len(actions), value, bestValue, bestMove
+
+
+# Search the move played first with a full window, then the other moves with the best value so far as
+# the bound of the mover, so that only better moves get exact values.
+# Returns the value of the move played, the best value and the best move.
+def searchMoves(player, state, humanTurn, played, actions, depthLimit):
+    player.startSearch(depthLimit)
+    player.currentDepth = 1
+    childValue = player.maxValue if humanTurn else player.minValue
+
+    captured = state.applyAction(played)
+    value = childValue(state, -math.inf, math.inf, depthLimit - 1)
+    state.resetAction(played, captured)
+
+    bestValue = value
+    bestMove = played
+    for a in actions:
+        if a == played:
+            continue
+        captured = state.applyAction(a)
+        if humanTurn:
+            next = childValue(state, -math.inf, bestValue, depthLimit - 1)
+        else:
+            next = childValue(state, bestValue, math.inf, depthLimit - 1)
+        state.resetAction(a, captured)
+        if (next < bestValue) if humanTurn else (next > bestValue):
+            bestValue = next
+            bestMove = a
+    return value, bestValue, bestMove
+
+
+# Counters of an analysis, and the worst blunders
+class AnalysisStats:
+    # Keep this many of the worst blunders
+    MAX_BLUNDERS = 10
+
+    def __init__(self, threshold):
+        # a move is a blunder when it loses at least this much value against the best move
+        self.threshold = threshold
+        self.games = 0
+        self.positions = 0
+        self.forcedMoves = 0
+        self.legalMoves = 0
+        # per side, index 0 for the AI (negative) side and 1 for the human (positive) side
+        self.moves = [0, 0]
+        self.bestMoves = [0, 0]
+        self.blunders = [0, 0]
+        self.valueLost = [0, 0]
+        # heap of (value lost, game index, ply, humanTurn, move played, best move)
+        self.worstBlunders = []
+
+    def add(self, analysis):
+        gameIndex, ply, humanTurn, action, numActions, value, bestValue, bestMove = analysis
+        if ply == 0:
+            self.games += 1
+        self.positions += 1
+        self.legalMoves += numActions
+        side = int(humanTurn)
+        self.moves[side] += 1
+        if value is None:
+            self.forcedMoves += 1
+            return
+        lost = value - bestValue if humanTurn else bestValue - value
+        if lost == 0:
+            self.bestMoves[side] += 1
+            return
+        self.valueLost[side] += lost
+        if lost >= self.threshold:
+            self.blunders[side] += 1
+            self.addBlunder((lost, gameIndex, ply, humanTurn, tuple(action), tuple(bestMove)))
+
+    def addBlunder(self, blunder):
+        if len(self.worstBlunders) < self.MAX_BLUNDERS:
+            heapq.heappush(self.worstBlunders, blunder)
+        else:
+            heapq.heappushpop(self.worstBlunders, blunder)
+
+    # Add the counters of the analysis of another shard
+    def merge(self, other):
+        self.games += other.games
+        self.positions += other.positions
+        self.forcedMoves += other.forcedMoves
+        self.legalMoves += other.legalMoves
+        for side in range(2):
+            self.moves[side] += other.moves[side]
+            self.bestMoves[side] += other.bestMoves[side]
+            self.blunders[side] += other.blunders[side]
+            self.valueLost[side] += other.valueLost[side]
+        for blunder in other.worstBlunders:
+            self.addBlunder(blunder)
+
+    def printSummary(self, seconds):
+        print("{0:d} games, {1:d} positions, {2:.1f} legal moves per position, {3:d} forced moves".format(
+            self.games, self.positions, self.legalMoves / self.positions if self.positions else 0,
+            self.forcedMoves))
+        print("{0:8} {1:>8} {2:>10} {3:>9} {4:>16}".format("side", "moves", "best move", "blunders",
+                                                           "avg value lost"))
+        for side, name in enumerate(("negative", "positive")):
+            moves = self.moves[side]
+            print("{0:8} {1:8d} {2:9.1f}% {3:9d} {4:16.1f}".format(
+                name, moves, 100 * self.bestMoves[side] / moves if moves else 0, self.blunders[side],
+                self.valueLost[side] / moves if moves else 0))
+        if self.worstBlunders:
+            print()
+            print("Worst blunders (value lost of at least {0}):".format(self.threshold))
+            for lost, gameIndex, ply, humanTurn, action, bestMove in sorted(self.worstBlunders, reverse=True):
+                print("game {0:d}, move {1:d}, {2} side: {3} instead of {4}, {5} lost".format(
+                    gameIndex, ply + 1, "positive" if humanTurn else "negative", action, bestMove, lost))
+        print()
+        print("{0:d} positions in {1:.1f} seconds, {2:.0f} positions per second".format(
+            self.positions, seconds, self.positions / seconds if seconds > 0 else 0))
+
+
+# Analyze the games of the record file that start in [startOffset, endOffset) and return their AnalysisStats.
+# Runs in a worker process, with a player of its own.
+def analyzeShard(path, startOffset, endOffset, depthLimit, threshold, weights=DEFAULT_WEIGHTS):
+    player = AIPlayer(None, 1, weights=weights)
+    stats = AnalysisStats(threshold)
+    try:
+        for analysis in analyzePositions(iterPositions(iterGames(path, startOffset, endOffset)), player, depthLimit):
+            stats.add(analysis)
+    finally:
+        player.shutdown()
+    return stats
+
+
+# Split the games of the record file into the given number of ranges of file offsets of about the same size
+def shardOffsets(path, shards):
+    with GameRecordReader(path) as reader:
+        size = reader.getSize()
+    bounds = [HEADER.size + (size - HEADER.size) * i // shards for i in range(shards)] + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the blunders in the games of a game record file.")
+    parser.add_argument("path", help="game record file written by GameRecord.py")
+    parser.add_argument("--depth", type=int, default=4, help="depth limit of the search of every position (default 4)")
+    parser.add_argument("--threshold", type=int, default=DEFAULT_WEIGHTS[2],
+                        help="value lost that makes a move a blunder (default {0:d}, one checker in the heuristic "
+                             "value)".format(DEFAULT_WEIGHTS[2]))
+    parser.add_argument("--weights", help="evaluation weights of the search, e.g. 500/50/50/10/1 (default)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of shards analyzed at the same time (default: number of CPUs)")
+    parser.add_argument("--shards", type=int, help="number of ranges the file is split into (default: 4 per worker)")
+    args = parser.parse_args()
+    if args.depth < 1:
+        parser.error("--depth must be at least 1")
+    weights = DEFAULT_WEIGHTS
+    if args.weights:
+        try:
+            weights = tuple(int(weight) for weight in args.weights.split("/"))
+        except ValueError:
+            weights = ()
+        if len(weights) != len(DEFAULT_WEIGHTS):
+            parser.error("Invalid weights: {0}".format(args.weights))
+
+    try:
+        shards = shardOffsets(args.path, args.shards or 4 * args.workers)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    stats = AnalysisStats(args.threshold)
+    starttime = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(analyzeShard, args.path, startOffset, endOffset, args.depth, args.threshold,
+                                   weights)
+                   for startOffset, endOffset in shards]
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            stats.merge(future.result())
+            print("\rAnalyzed {0:d}/{1:d} shards".format(done, len(shards)), end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+
+    stats.printSummary(time.perf_counter() - starttime)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
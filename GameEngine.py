@@ -0,0 +1,283 @@
+# The rules of the mini-checkers game, without any user interface.
+# Player checkers have positive labels and move up the board (towards row 0),
+# opponent (AI) checkers have negative labels and move down the board.
+class GameEngine:
+    def __init__(self, playerTurn=True):
+        self.opponentCheckers = None
+        self.playerCheckers = None
+        self.checkerPositions = None
+        # bitboards of the checkers, bit (row * 8 + col) set for an occupied square, kept up to date
+        # by every move so that getPosition does not need to scan the board
+        self.opponentPieces = 0
+        self.playerPieces = 0
+        self.board = self.initBoard()
+        self.playerTurn = playerTurn
+
+    # This function initializes the game board.
+    def initBoard(self):
+        board = [[0] * 8 for _ in range(8)]  # Change board size
+        self.playerCheckers = set()
+        self.opponentCheckers = set()
+        self.checkerPositions = {}
+        self.opponentPieces = 0
+        self.playerPieces = 0
+        # Setting up checkers for an 8x8 board (3 rows each side)
+        for i in range(8):
+            if i < 3 or i > 4:  # Only populate 3 rows at the top and bottom
+                for j in range(8):
+                    if (i + j) % 2 == 1:
+                        if i < 3:
+                            board[i][j] = -(len(self.opponentCheckers) + 1)
+                            self.opponentCheckers.add(board[i][j])
+                            self.opponentPieces |= 1 << (i * 8 + j)
+                            self.checkerPositions[board[i][j]] = (i, j)
+                        else:
+                            board[i][j] = len(self.playerCheckers) + 1
+                            self.playerCheckers.add(board[i][j])
+                            self.playerPieces |= 1 << (i * 8 + j)
+                            self.checkerPositions[board[i][j]] = (i, j)
+        return board
+
+    # Replace the board with the given one. Only the sign of every square matters,
+    # the checkers are labeled again in row order.
+    def setBoard(self, board):
+        self.board = [[0] * 8 for _ in range(8)]
+        self.playerCheckers = set()
+        self.opponentCheckers = set()
+        self.checkerPositions = {}
+        self.opponentPieces = 0
+        self.playerPieces = 0
+        for i in range(8):
+            for j in range(8):
+                if board[i][j] < 0:
+                    self.board[i][j] = -(len(self.opponentCheckers) + 1)
+                    self.opponentCheckers.add(self.board[i][j])
+                    self.opponentPieces |= 1 << (i * 8 + j)
+                elif board[i][j] > 0:
+                    self.board[i][j] = len(self.playerCheckers) + 1
+                    self.playerCheckers.add(self.board[i][j])
+                    self.playerPieces |= 1 << (i * 8 + j)
+                else:
+                    continue
+                self.checkerPositions[self.board[i][j]] = (i, j)
+
+    def getBoard(self):
+        return self.board
+
+    # The position as (opponent bitboard, player bitboard), the (AI, human) position of AIGameState
+    def getPosition(self):
+        return self.opponentPieces, self.playerPieces
+
+    def printBoard(self):
+        for i in range(len(self.board)):
+            for j in range(len(self.board[i])):
+                check = self.board[i][j]
+                if check < 0:
+                    print(check, end=' ')
+                else:
+                    print(' ' + str(check), end=' ')
+
+            print()
+
+    def isPlayerTurn(self):
+        return self.playerTurn
+
+    # Switch turns between player and opponent.
+    # If one of them has no legal moves, the other can keep playing
+    def changePlayerTurn(self):
+        if self.playerTurn and self.opponentCanContinue():
+            self.playerTurn = False
+        elif not self.playerTurn and self.playerCanContinue():
+            self.playerTurn = True
+
+    # Check if the given move is one of the possible moves of the player whose turn it is
+    def isLegalMove(self, oldrow, oldcol, row, col):
+        return [oldrow, oldcol, row, col] in self.getPossibleActions(self.playerTurn)
+
+    # Apply a legal move of the player whose turn it is and pass the turn on.
+    # Returns False, leaving the game unchanged, if the move is not legal.
+    def play(self, oldrow, oldcol, row, col):
+        if not self.isLegalMove(oldrow, oldcol, row, col):
+            return False
+        self.makeMove(oldrow, oldcol, row, col)
+        if not self.isGameOver():
+            self.changePlayerTurn()
+        return True
+
+    # update checker position
+    # return the label of the captured checker, 0 if none
+    def makeMove(self, oldrow, oldcol, row, col):
+        toMove = self.board[oldrow][oldcol]
+        self.checkerPositions[toMove] = (row, col)
+
+        # move the checker
+        self.board[row][col] = self.board[oldrow][oldcol]
+        self.board[oldrow][oldcol] = 0
+        self.togglePieces(toMove, (1 << (oldrow * 8 + oldcol)) | (1 << (row * 8 + col)))
+
+        # capture move, remove captured checker
+        toRemove = 0
+        if abs(oldrow - row) == 2:
+            toRemove = self.board[(oldrow + row) // 2][(oldcol + col) // 2]
+            if toRemove > 0:
+                self.playerCheckers.remove(toRemove)
+            else:
+                self.opponentCheckers.remove(toRemove)
+            self.togglePieces(toRemove, 1 << ((oldrow + row) // 2 * 8 + (oldcol + col) // 2))
+            self.board[(oldrow + row) // 2][(oldcol + col) // 2] = 0
+            self.checkerPositions.pop(toRemove, None)
+
+        changes = [(oldrow, oldcol, 0), (row, col, toMove)]
+        if toRemove:
+            changes.append(((oldrow + row) // 2, (oldcol + col) // 2, 0))
+        self.boardChanged(changes)
+        return toRemove
+
+    # undo a move applied by makeMove, given the label of the checker it captured
+    def undoMove(self, oldrow, oldcol, row, col, captured):
+        toMove = self.board[row][col]
+        self.checkerPositions[toMove] = (oldrow, oldcol)
+        self.board[oldrow][oldcol] = toMove
+        self.board[row][col] = 0
+        self.togglePieces(toMove, (1 << (oldrow * 8 + oldcol)) | (1 << (row * 8 + col)))
+
+        if captured:
+            self.board[(oldrow + row) // 2][(oldcol + col) // 2] = captured
+            self.checkerPositions[captured] = ((oldrow + row) // 2, (oldcol + col) // 2)
+            if captured > 0:
+                self.playerCheckers.add(captured)
+            else:
+                self.opponentCheckers.add(captured)
+            self.togglePieces(captured, 1 << ((oldrow + row) // 2 * 8 + (oldcol + col) // 2))
+
+        changes = [(row, col, 0), (oldrow, oldcol, toMove)]
+        if captured:
+            changes.append(((oldrow + row) // 2, (oldcol + col) // 2, captured))
+        self.boardChanged(changes)
+
+    # flip the given bits in the bitboard of the side of the checker with the given label
+    def togglePieces(self, label, bits):
+        if label > 0:
+            self.playerPieces ^= bits
+        else:
+            self.opponentPieces ^= bits
+
+    # Called whenever the board changes, front-ends override it to redraw.
+    # changes lists the (row, col, label) of every square that changed, label 0 for an empty square.
+    def boardChanged(self, changes):
+        pass
+
+    # Get all possible moves for the player
+    def getPossiblePlayerActions(self):
+        return self.getPossibleActions(True)
+
+    # Get all possible moves for the player (playerTurn) or the opponent
+    def getPossibleActions(self, playerTurn):
+        if playerTurn:
+            checkers = self.playerCheckers
+            regularDirs = [[-1, -1], [-1, 1]]
+            captureDirs = [[-2, -2], [-2, 2]]
+        else:
+            checkers = self.opponentCheckers
+            regularDirs = [[1, -1], [1, 1]]
+            captureDirs = [[2, -2], [2, 2]]
+
+        regularMoves = []
+        captureMoves = []
+        for checker in checkers:
+            oldrow = self.checkerPositions[checker][0]
+            oldcol = self.checkerPositions[checker][1]
+            for dir in regularDirs:
+                if self.isValidMove(oldrow, oldcol, oldrow + dir[0], oldcol + dir[1], playerTurn):
+                    regularMoves.append([oldrow, oldcol, oldrow + dir[0], oldcol + dir[1]])
+            for dir in captureDirs:
+                if self.isValidMove(oldrow, oldcol, oldrow + dir[0], oldcol + dir[1], playerTurn):
+                    captureMoves.append([oldrow, oldcol, oldrow + dir[0], oldcol + dir[1]])
+
+        # must take capture move if possible
+        if captureMoves:
+            return captureMoves
+        else:
+            return regularMoves
+
+    # check if the given move if valid for the current player
+    def isValidMove(self, oldrow, oldcol, row, col, playerTurn):
+        # invalid index
+        if oldrow < 0 or oldrow > 7 or oldcol < 0 or oldcol > 7 \
+                or row < 0 or row > 7 or col < 0 or col > 7:
+            return False
+        # No checker exists in original position
+        if self.board[oldrow][oldcol] == 0:
+            return False
+        # Another checker exists in destination position
+        if self.board[row][col] != 0:
+            return False
+
+        # player's turn
+        if playerTurn:
+            if row - oldrow == -1:  # regular move
+                return abs(col - oldcol) == 1
+            elif row - oldrow == -2:  # capture move
+                #  \ direction or / direction
+                return (col - oldcol == -2 and self.board[row + 1][col + 1] < 0) \
+                    or (col - oldcol == 2 and self.board[row + 1][col - 1] < 0)
+            else:
+                return False
+        # opponent's turn
+        else:
+            if row - oldrow == 1:  # regular move
+                return abs(col - oldcol) == 1
+            elif row - oldrow == 2:  # capture move
+                # / direction or \ direction
+                return (col - oldcol == -2 and self.board[row - 1][col + 1] > 0) \
+                    or (col - oldcol == 2 and self.board[row - 1][col - 1] > 0)
+            else:
+                return False
+
+    # Check if the player can continue
+    def playerCanContinue(self):
+        directions = [[-1, -1], [-1, 1], [-2, -2], [-2, 2]]
+        for checker in self.playerCheckers:
+            position = self.checkerPositions[checker]
+            row = position[0]
+            col = position[1]
+            for dir in directions:
+                if self.isValidMove(row, col, row + dir[0], col + dir[1], True):
+                    return True
+        return False
+
+    # Check whether opponent can continue
+    def opponentCanContinue(self):
+        directions = [[1, -1], [1, 1], [2, -2], [2, 2]]
+        for checker in self.opponentCheckers:
+            position = self.checkerPositions[checker]
+            row = position[0]
+            col = position[1]
+            for dir in directions:
+                if self.isValidMove(row, col, row + dir[0], col + dir[1], False):
+                    return True
+        return False
+
+    # Neither player can can continue, thus game over
+    def isGameOver(self):
+        if len(self.playerCheckers) == 0 or len(self.opponentCheckers) == 0:
+            return True
+        else:
+            return (not self.playerCanContinue()) and (not self.opponentCanContinue())
+
+    # 1 if the player has more checkers left, -1 if the opponent has, 0 for a draw
+    def getWinner(self):
+        playerNum = len(self.playerCheckers)
+        opponentNum = len(self.opponentCheckers)
+        return (playerNum > opponentNum) - (playerNum < opponentNum)
+
+    # Describe the result of a finished game
+    def getGameSummary(self):
+        playerNum = len(self.playerCheckers)
+        opponentNum = len(self.opponentCheckers)
+        if (playerNum > opponentNum):
+            return "Player won by {0:d} checkers! Congratulation!".format(playerNum - opponentNum)
+        elif (playerNum < opponentNum):
+            return "Computer won by {0:d} checkers! Try again!".format(opponentNum - playerNum)
+        else:
+            return "It is a draw! Try again!"
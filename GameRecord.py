@@ -0,0 +1,299 @@
+import argparse  # for the command line options
+import bisect  # to find games by file offset
+import mmap  # to read records without loading the whole file
+import os  # for file sizes
+import struct  # for the binary file format
+import sys  # for the exit status
+from AIPlayer import AIGameState, DARK_SQUARES, DARK_INDEX
+
+# Compact binary game records.
+#
+# A position with the side to move fits in 9 bytes: 2 bits for each of the 32 dark squares
+# (0 empty, 1 AI checker, 2 human checker), dark square i in bits 2i and 2i + 1 of a 64-bit integer,
+# followed by one byte that is 1 when the human moves. A move fits in one byte, because a checker
+# only moves forward: the dark square it starts from, whether it captures and whether it moves to the
+# higher column. Which player moved follows from the checker on the start square.
+#
+# A game record file is append-only. Every record is the start position, the number of moves, the
+# winner (as GameEngine.getWinner) and one byte per move. Next to it, the index file (path + ".idx")
+# keeps the 64-bit file offset of every record, so game i is found without reading the games before it.
+#
+# File format, little-endian:
+#   header: magic, version
+#   one record per game: squares, human to move, number of moves, winner, moves
+
+MAGIC = b"CKGR"
+VERSION = 1
+HEADER = struct.Struct("<4sH")
+POSITION = struct.Struct("<QB")
+RECORD = struct.Struct("<QBHb")
+OFFSET = struct.Struct("<Q")
+
+# SQUARE_CODES[code] is the (AI, human) bit of a 2-bit square code
+SQUARE_CODES = [(0, 0), (1, 0), (0, 1), (0, 0)]
+
+
+# Pack the AI and human bitboards of AIGameState into 2 bits per dark square
+def packSquares(AIPieces, humanPieces):
+    squares = 0
+    pieces = AIPieces
+    while pieces:
+        low = pieces & -pieces
+        squares |= 1 << 2 * DARK_INDEX[low.bit_length() - 1]
+        pieces ^= low
+    pieces = humanPieces
+    while pieces:
+        low = pieces & -pieces
+        squares |= 2 << 2 * DARK_INDEX[low.bit_length() - 1]
+        pieces ^= low
+    return squares
+
+
+# Unpack 2 bits per dark square into (AI bitboard, human bitboard)
+def unpackSquares(squares):
+    AIPieces = 0
+    humanPieces = 0
+    for square in DARK_SQUARES:
+        AIBit, humanBit = SQUARE_CODES[squares & 3]
+        AIPieces |= AIBit << square
+        humanPieces |= humanBit << square
+        squares >>= 2
+    return AIPieces, humanPieces
+
+
+# The 9 bytes of a position and the side to move
+def encodePosition(AIPieces, humanPieces, humanTurn):
+    return POSITION.pack(packSquares(AIPieces, humanPieces), humanTurn)
+
+
+# (AI bitboard, human bitboard, whether the human moves) of 9 bytes written by encodePosition
+def decodePosition(data, offset=0):
+    squares, humanTurn = POSITION.unpack_from(data, offset)
+    return unpackSquares(squares) + (bool(humanTurn),)
+
+
+# The byte of the action [oldrow, oldcol, row, col]: start square | capture << 5 | higher column << 6
+def encodeMove(action):
+    return DARK_INDEX[action[0] * 8 + action[1]] | (abs(action[2] - action[0]) == 2) << 5 \
+        | (action[3] > action[1]) << 6
+
+
+# The action of a move byte in the given AIGameState, before the move is applied
+def decodeMove(code, state):
+    oldsquare = DARK_SQUARES[code & 31]
+    distance = 2 if code & 32 else 1
+    rowStep = distance if state.AIPieces >> oldsquare & 1 else -distance
+    colStep = distance if code & 64 else -distance
+    return [oldsquare >> 3, oldsquare & 7, (oldsquare >> 3) + rowStep, (oldsquare & 7) + colStep]
+
+
+# One game read from a record file. The moves are kept as bytes and only decoded when they are replayed.
+class GameRecord:
+    def __init__(self, start, moveCodes, winner):
+        # (AI bitboard, human bitboard, whether the human moves first)
+        self.start = start
+        self.moveCodes = moveCodes
+        self.winner = winner
+
+    def __len__(self):
+        return len(self.moveCodes)
+
+    # Yield (state, humanTurn, action) for every move, where state is the AIGameState before the move.
+    # The same state object is updated in place, so it is only valid until the next move is yielded.
+    def replay(self):
+        state = AIGameState.fromPosition(self.start[:2])
+        for code in self.moveCodes:
+            action = decodeMove(code, state)
+            yield state, not state.AIPieces >> (action[0] * 8 + action[1]) & 1, action
+            state.applyAction(action)
+
+    # The moves as [oldrow, oldcol, row, col] actions
+    def getMoves(self):
+        return [action for state, humanTurn, action in self.replay()]
+
+
+# Appends games to a record file and its index
+class GameRecordWriter:
+    def __init__(self, path):
+        self.path = path
+        indexPath = path + ".idx"
+        self.file = open(path, "a+b")
+        self.index = open(indexPath, "a+b")
+        try:
+            self.file.seek(0)
+            header = self.file.read(HEADER.size)
+            if not header:
+                self.file.write(HEADER.pack(MAGIC, VERSION))
+            elif len(header) != HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION):
+                raise ValueError("Not a game record file: {0}".format(path))
+            self.count = self.recover()
+        except ValueError:
+            self.close()
+            raise
+
+    # Drop the end of a record that was being written when a previous writer stopped,
+    # so that the index covers every record in the file. Returns the number of games.
+    def recover(self):
+        indexSize = os.path.getsize(self.index.name)
+        count = indexSize // OFFSET.size
+        end = HEADER.size
+        if count:
+            self.index.seek((count - 1) * OFFSET.size)
+            offset = OFFSET.unpack(self.index.read(OFFSET.size))[0]
+            self.file.seek(offset)
+            record = self.file.read(RECORD.size)
+            if len(record) != RECORD.size:
+                raise ValueError("The index does not match the game record file: {0}".format(self.path))
+            end = offset + RECORD.size + RECORD.unpack(record)[2]
+        if indexSize != count * OFFSET.size:
+            self.index.truncate(count * OFFSET.size)
+        if os.path.getsize(self.path) > end:
+            self.file.truncate(end)
+        return count
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Append a game that started in start = (AI bitboard, human bitboard, whether the human moves)
+    # and went on with the given [oldrow, oldcol, row, col] moves. Returns the index of the game.
+    def append(self, start, moves, winner):
+        AIPieces, humanPieces, humanTurn = start
+        self.file.seek(0, os.SEEK_END)
+        offset = self.file.tell()
+        self.file.write(RECORD.pack(packSquares(AIPieces, humanPieces), humanTurn, len(moves), winner)
+                        + bytes(encodeMove(move) for move in moves))
+        self.file.flush()
+        # the record is complete before the index points to it
+        self.index.write(OFFSET.pack(offset))
+        self.index.flush()
+        self.count += 1
+        return self.count - 1
+
+
+# Reads games from a record file. The file and its index are memory-mapped,
+# so reading one game only touches the pages it is stored in.
+class GameRecordReader:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.indexFile = open(path + ".idx", "rb")
+        self.data = b""
+        self.index = b""
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            if len(self.data) < HEADER.size or HEADER.unpack_from(self.data, 0) != (MAGIC, VERSION):
+                raise ValueError("Not a game record file: {0}".format(path))
+            # an empty file cannot be memory-mapped
+            if os.path.getsize(self.indexFile.name) >= OFFSET.size:
+                self.index = mmap.mmap(self.indexFile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self.close()
+            raise
+        self.count = len(self.index) // OFFSET.size
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        if isinstance(self.index, mmap.mmap):
+            self.index.close()
+        self.file.close()
+        self.indexFile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    # File offset of game i
+    def getOffset(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError("No game {0:d} in {1}, it has {2:d} games".format(i, self.path, self.count))
+        return OFFSET.unpack_from(self.index, i * OFFSET.size)[0]
+
+    # The GameRecord at the given file offset and the file offset of the next one
+    def readRecord(self, offset):
+        squares, humanTurn, numMoves, winner = RECORD.unpack_from(self.data, offset)
+        end = offset + RECORD.size + numMoves
+        if end > len(self.data):
+            raise ValueError("Truncated game record at offset {0:d} of {1}".format(offset, self.path))
+        start = unpackSquares(squares) + (bool(humanTurn),)
+        return GameRecord(start, self.data[offset + RECORD.size:end], winner), end
+
+    def readGame(self, i):
+        return self.readRecord(self.getOffset(i))[0]
+
+    # Size of the record file in bytes
+    def getSize(self):
+        return len(self.data)
+
+    # Index of the first game that starts at or after the given file offset
+    def findGame(self, offset):
+        return bisect.bisect_left(range(self.count), offset, key=self.getOffset)
+
+    # Yield (index, GameRecord) for the games first, first + 1, ... before last.
+    # Only the first game is looked up in the index, the others are read in file order.
+    def iterGames(self, first=0, last=None):
+        last = self.count if last is None else min(last, self.count)
+        if first >= last:
+            return
+        offset = self.getOffset(first)
+        for i in range(first, last):
+            game, offset = self.readRecord(offset)
+            yield i, game
+
+    def __getitem__(self, i):
+        return self.readGame(i + self.count if i < 0 else i)
+
+    # Yield the games one after the other, without the index
+    def __iter__(self):
+        offset = HEADER.size
+        while offset + RECORD.size <= len(self.data):
+            try:
+                game, offset = self.readRecord(offset)
+            except ValueError:
+                # a writer is still appending this record
+                return
+            yield game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the games of a game record file.")
+    parser.add_argument("path", help="game record file")
+    parser.add_argument("--game", type=int, help="print the moves of this game")
+    args = parser.parse_args()
+
+    with GameRecordReader(args.path) as reader:
+        if args.game is None:
+            winners = [0, 0, 0]
+            moves = 0
+            for game in reader:
+                winners[game.winner + 1] += 1
+                moves += len(game)
+            print("{0:d} games, {1:d} moves: {2:d} won by the positive side, {3:d} draws, "
+                  "{4:d} won by the negative side".format(len(reader), moves, winners[2], winners[1], winners[0]))
+            return 0
+        try:
+            game = reader.readGame(args.game)
+        except IndexError as e:
+            parser.error(str(e))
+        print("Game {0:d}: {1} moves first, winner {2:d}".format(args.game, "human" if game.start[2] else "AI",
+                                                                 game.winner))
+        for number, (state, humanTurn, action) in enumerate(game.replay(), 1):
+            print("{0:3d}. {1:5} ({2:d}, {3:d}) -> ({4:d}, {5:d})".format(number, "human" if humanTurn else "AI",
+                                                                          *action))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
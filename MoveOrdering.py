@@ -0,0 +1,74 @@
+# Scores that put the principal variation / transposition table move and the killer moves
+# ahead of every move ranked by the history table alone
+PV_SCORE = 1 << 40
+TT_SCORE = 1 << 39
+KILLER_SCORE = 1 << 38
+
+# Number of killer moves remembered per ply
+NUM_KILLERS = 2
+
+
+# Orders the moves of a search node so that alpha-beta tries the most promising ones first:
+# 1. the move of the previous iteration's principal variation,
+# 2. the best move stored in the transposition table,
+# 3. the killer moves of this ply (moves that caused a cutoff in a sibling node),
+# 4. everything else by its history score (how often and how deep the move caused cutoffs).
+# Captures are forced, so a node never mixes capture and regular moves and they need no separate rank.
+class MoveOrderer:
+    def __init__(self, maxPly=64):
+        self.killers = [[None] * NUM_KILLERS for _ in range(maxPly)]
+        # history[move] of a packed move oldsquare | square << 6, where square = row * 8 + col
+        self.history = [0] * (64 * 64)
+        # the moves orderMoves ranks first and the killers of its ply, read by scoreMove
+        self.pvMove = None
+        self.ttMove = None
+        self.plyKillers = None
+        # sort key of orderMoves, bound once so that sorting creates no function per node
+        self.sortKey = self.scoreMove
+
+    # Prepare for a new search: killers only describe the previous tree, older history counts for less
+    def newSearch(self, maxPly):
+        self.killers = [[None] * NUM_KILLERS for _ in range(maxPly)]
+        self.history = [score >> 1 for score in self.history]
+
+    def clear(self):
+        self.history = [0] * (64 * 64)
+
+    # Sort the given packed moves in place and return them
+    def orderMoves(self, moves, ply, ttMove=None, pvMove=None):
+        if len(moves) < 2:
+            return moves
+        self.pvMove = pvMove
+        self.ttMove = ttMove
+        self.plyKillers = self.killers[ply]
+        moves.sort(key=self.sortKey, reverse=True)
+        return moves
+
+    # Sort key of orderMoves for the node it is sorting
+    def scoreMove(self, move):
+        if move == self.pvMove:
+            return PV_SCORE
+        if move == self.ttMove:
+            return TT_SCORE
+        killers = self.plyKillers
+        if move in killers:
+            return KILLER_SCORE + NUM_KILLERS - killers.index(move)
+        return self.history[move]
+
+    # At the root every move is searched anyway. Only the PV and TT moves are moved to the front,
+    # the rest keep the order of AIGameState.generateMoves, so the serial and the parallel search
+    # try root moves in the same order and pick the same move among equally good ones.
+    def orderRootMoves(self, moves, ttMove=None, pvMove=None):
+        for first in (ttMove, pvMove):
+            if first is not None and first in moves:
+                moves.remove(first)
+                moves.insert(0, first)
+        return moves
+
+    # Remember a packed move that caused a cutoff at the given ply with depthLimit plies left
+    def recordCutoff(self, move, ply, depthLimit):
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1:] = killers[:-1]
+            killers[0] = move
+        self.history[move] += depthLimit * depthLimit
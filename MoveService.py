@@ -0,0 +1,305 @@
+import argparse  # for the command line options
+import collections  # for the request queues and the result cache
+import concurrent.futures  # for the worker pool and the futures of the moves
+import json  # for the socket protocol
+import os  # for the number of CPUs
+import socketserver  # to accept move requests over TCP
+import sys  # for the exit status
+import threading  # to guard the queues
+import time  # for the deadlines
+from AIPlayer import AIPlayer, AIGameState, DARK_SQUARES
+from Perft import parsePosition
+
+# Move service for many games at the same time.
+#
+# Games submit the positions where the AI has to move and get a future of the move back. A fixed pool of
+# worker processes searches the positions, so the number of searches running at once never grows with
+# the number of games. Requests wait in one queue per game, and the games take turns (round robin), so a
+# game that sends many requests cannot hold up the others. Every request has a deadline: the search gets
+# the time that is left when a worker picks it up, and a request whose deadline has passed still gets the
+# move of a depth-1 search at once. Requests for a position that is already queued or being searched
+# share that search. The moves of recent searches that reached their depth limit are answered from a cache;
+# moves of searches cut short by their deadline are not kept, since a request with more time does better.
+#
+# The service can be used in-process (MoveService.submit) or over TCP, one JSON object per line:
+#   request:  {"id": 1, "game": "g1", "position": ".a.a..../...", "difficulty": 1, "deadline": 2.0}
+# where the difficulty is 1 (hard, the default) or 2 (medium) and the position is written as in Perft.py.
+#   response: {"id": 1, "move": [oldrow, oldcol, row, col]} or {"id": 1, "error": "..."}
+# Responses come back in the order the moves are found, not in the order of the requests.
+
+# Seconds of the deadline kept back for handing the move back from the worker process
+DEADLINE_MARGIN = 0.05
+# Levels of difficulty of AIPlayer the service searches with
+DIFFICULTIES = (1, 2)
+# Squares checkers can stand on
+DARK_MASK = sum(1 << square for square in DARK_SQUARES)
+
+
+# A position waiting for a worker or being searched, with the futures of every request that asked for it
+class MoveRequest:
+    def __init__(self, key, game, deadline):
+        # (AI bitboard, human bitboard, difficulty)
+        self.key = key
+        self.game = game
+        self.deadline = deadline
+        self.futures = []
+        # whether a worker is searching it
+        self.started = False
+        # whether its search started after the deadline, with no time left
+        self.late = False
+
+
+# The AI players of a worker process of the move service, one per level of difficulty
+servicePlayers = {}
+
+
+# Worker process task: the AI's move in the given position, searched for at most timeLimit seconds.
+# Returns the move and whether it is as good as the player finds with unlimited time: a book move,
+# the only legal move or the move of a search that reached its depth limit.
+def searchMove(position, difficulty, timeLimit, options):
+    player = servicePlayers.get(difficulty)
+    if player is None:
+        player = servicePlayers[difficulty] = AIPlayer(None, difficulty, **options)
+    player.timeLimit = timeLimit
+    move = player.getNextMove(AIGameState.fromPosition(position))
+    stats = player.searchStats
+    return move, stats.source == "book" or not stats.iterations or stats.completedDepth == stats.depthLimit
+
+
+class MoveService:
+    # workers: number of worker processes, the most searches that run at the same time
+    # timeLimit: deadline in seconds of requests without a deadline of their own
+    # cacheSize: number of recently found moves kept to answer repeated positions
+    # Other keyword arguments are passed on to the AIPlayer of every worker, e.g. weights or tablebase.
+    def __init__(self, workers=os.cpu_count(), timeLimit=14, cacheSize=4096, **options):
+        self.workers = workers
+        self.timeLimit = timeLimit
+        self.cacheSize = cacheSize
+        self.options = options
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+        # reentrant, because a search that is already done runs its callback inside dispatch
+        self.lock = threading.RLock()
+        # queues[game] holds the waiting requests of a game, ready the games with waiting requests in turn
+        self.queues = {}
+        self.ready = collections.deque()
+        # requests by key, from submit until their move is found
+        self.requests = {}
+        self.running = 0
+        # moves of recently searched positions by key, the oldest first
+        self.cache = collections.OrderedDict()
+        self.closed = False
+
+        # statistics
+        self.numRequests = 0
+        self.numSearches = 0
+        self.numShared = 0
+        self.numCacheHits = 0
+        self.numLate = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    # Ask for the AI's move in the given AIGameState, or (AI bitboard, human bitboard) position, of a game.
+    # The move is due deadline seconds from now (by default the time limit of the service).
+    # Returns a concurrent.futures.Future of the move (oldrow, oldcol, row, col);
+    # asyncio code can await it with asyncio.wrap_future.
+    # Raises ValueError for an unknown level of difficulty or a position that is not a checkers position.
+    def submit(self, game, position, difficulty=1, deadline=None):
+        if isinstance(position, AIGameState):
+            position = position.getPosition()
+        if difficulty not in DIFFICULTIES:
+            raise ValueError("Unknown level of difficulty: {0}".format(difficulty))
+        AIPieces, humanPieces = position
+        if AIPieces & humanPieces or (AIPieces | humanPieces) & ~DARK_MASK:
+            raise ValueError("Checkers must stand on different dark squares: {0:#x} {1:#x}".format(
+                AIPieces, humanPieces))
+        key = (position[0], position[1], difficulty)
+        due = time.monotonic() + (self.timeLimit if deadline is None else deadline)
+        future = concurrent.futures.Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("The move service is shut down")
+            self.numRequests += 1
+            move = self.cache.get(key)
+            if move is not None:
+                self.cache.move_to_end(key)
+                self.numCacheHits += 1
+                future.set_result(move)
+                return future
+            request = self.requests.get(key)
+            if request is not None:
+                # the same position is already queued or searched
+                self.numShared += 1
+                request.deadline = min(request.deadline, due)
+            else:
+                request = self.requests[key] = MoveRequest(key, game, due)
+                queue = self.queues.get(game)
+                if queue is None:
+                    queue = self.queues[game] = collections.deque()
+                    self.ready.append(game)
+                queue.append(request)
+            request.futures.append(future)
+            if request.started:
+                # too late to cancel, as for the requests that started the search
+                future.set_running_or_notify_cancel()
+            self.dispatch()
+        return future
+
+    # Hand waiting requests to the workers while some are idle, taking one request of every game in turn.
+    # Called with the lock held.
+    def dispatch(self):
+        while self.running < self.workers and self.ready:
+            game = self.ready.popleft()
+            queue = self.queues[game]
+            request = queue.popleft()
+            if queue:
+                self.ready.append(game)
+            else:
+                del self.queues[game]
+            # requests whose futures were all cancelled are not searched
+            request.futures = [future for future in request.futures if future.set_running_or_notify_cancel()]
+            if not request.futures:
+                del self.requests[request.key]
+                continue
+            timeLimit = request.deadline - time.monotonic() - DEADLINE_MARGIN
+            if timeLimit <= 0:
+                self.numLate += 1
+                request.late = True
+                timeLimit = 0
+            request.started = True
+            self.running += 1
+            self.numSearches += 1
+            search = self.startSearch(request.key, timeLimit)
+            search.add_done_callback(lambda search, request=request: self.searchDone(request, search))
+
+    # Start searching the position of the given key for at most timeLimit seconds on a worker.
+    # Returns a future of the move and whether the search was complete, see searchMove.
+    def startSearch(self, key, timeLimit):
+        return self.executor.submit(searchMove, key[:2], key[2], timeLimit, self.options)
+
+    # Pass the move of a finished search on to every request of its position and start the next search
+    def searchDone(self, request, search):
+        with self.lock:
+            self.running -= 1
+            del self.requests[request.key]
+            error = search.exception() if not search.cancelled() else RuntimeError("The move service is shut down")
+            move = None
+            if error is None:
+                move, complete = search.result()
+                # a search cut short by its deadline would answer later requests with more time as badly
+                if complete and not request.late:
+                    self.cache[request.key] = move
+                    if len(self.cache) > self.cacheSize:
+                        self.cache.popitem(last=False)
+            if not self.closed:
+                self.dispatch()
+        for future in request.futures:
+            if error is None:
+                future.set_result(move)
+            else:
+                future.set_exception(error)
+
+    # Numbers of requests, searches, requests that shared a search or were answered from the cache,
+    # searches that started after their deadline, and requests waiting or searched right now
+    def getStats(self):
+        with self.lock:
+            return {"requests": self.numRequests, "searches": self.numSearches, "shared": self.numShared,
+                    "cacheHits": self.numCacheHits, "late": self.numLate, "pending": len(self.requests),
+                    "running": self.running}
+
+    # Stop accepting requests, cancel the waiting ones and wait for the running searches
+    def shutdown(self):
+        with self.lock:
+            self.closed = True
+            waiting = [request for queue in self.queues.values() for request in queue]
+            self.queues = {}
+            self.ready.clear()
+            for request in waiting:
+                del self.requests[request.key]
+        for request in waiting:
+            for future in request.futures:
+                future.cancel()
+        self.executor.shutdown(wait=True)
+
+
+# Serves one TCP connection: reads requests line by line and writes every response as soon as its move
+# is found, so that one connection can have many requests in flight
+class MoveRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        writeLock = threading.Lock()
+
+        def respond(response):
+            with writeLock:
+                try:
+                    self.wfile.write((json.dumps(response) + "\n").encode())
+                    self.wfile.flush()
+                except OSError:
+                    pass  # the client is gone
+
+        pending = []
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            requestId = None
+            try:
+                request = json.loads(line)
+                requestId = request.get("id")
+                position = parsePosition(request["position"]).getPosition()
+                future = self.server.service.submit(request.get("game", self.client_address), position,
+                                                    int(request.get("difficulty", 1)), request.get("deadline"))
+            except (ValueError, KeyError, TypeError, AttributeError, RuntimeError) as e:
+                respond({"id": requestId, "error": str(e)})
+                continue
+            future.add_done_callback(
+                lambda future, requestId=requestId: respond(
+                    {"id": requestId, "move": list(future.result())} if future.exception() is None
+                    else {"id": requestId, "error": str(future.exception())}))
+            pending.append(future)
+        # answer the requests of a client that stopped sending before closing the connection
+        concurrent.futures.wait(pending)
+
+
+class MoveServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, service):
+        self.service = service
+        socketserver.ThreadingTCPServer.__init__(self, address, MoveRequestHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve AI moves for many games over TCP, one JSON object per line.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on (default 8765)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of searches at the same time (default: number of CPUs)")
+    parser.add_argument("--time-limit", type=float, default=14,
+                        help="deadline in seconds of requests without their own deadline (default 14)")
+    parser.add_argument("--tablebase", help="endgame tablebase file built by Tablebase.py")
+    parser.add_argument("--opening-book", help="opening book file built by OpeningBook.py")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    options = {"tablebase": args.tablebase, "openingBook": args.opening_book}
+    # check the files here once, the workers would only report them with every move
+    try:
+        AIPlayer(None, 1, **options).shutdown()
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    with MoveService(args.workers, args.time_limit, **options) as service, MoveServer((args.host, args.port), service) as server:
+        print("Serving moves on {0}:{1:d} with {2:d} workers".format(args.host, server.server_address[1],
+                                                                     args.workers), file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
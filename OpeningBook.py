@@ -0,0 +1,166 @@
+import argparse  # for the command line options
+import os  # for the number of CPUs
+import struct  # for the binary file format
+import sys  # for the exit status
+import time  # to report the build time
+import concurrent.futures  # to search the book positions in parallel
+from AIPlayer import AIPlayer, AIGameState, DEFAULT_WEIGHTS
+from GameEngine import GameEngine
+
+# Opening book: the best AI move for positions of the first moves of a game, found offline by deep searches.
+# Positions are keyed by the Zobrist hash of AIGameState with the AI to move.
+#
+# File format, little-endian:
+#   header: magic, version, number of entries, the five evaluation weights of the searches
+#   one entry per position: hash, old square, new square (square = row * 8 + col),
+#   depth of the search, value of the position (depth 0 and value 0 for a forced move, which is not searched)
+
+MAGIC = b"CKOB"
+# version 1 stored the values in 16 bits, too few for larger weights
+VERSION = 2
+HEADER = struct.Struct("<4sHI5i")
+ENTRY = struct.Struct("<QBBBi")
+
+
+# Best moves of opening positions, kept in a dictionary for constant time lookups
+class OpeningBook:
+    def __init__(self, path=None, weights=DEFAULT_WEIGHTS):
+        # entries[hash] = (oldrow, oldcol, row, col, depth, value)
+        self.entries = {}
+        # the moves were chosen by searches with these evaluation weights
+        self.weights = tuple(weights)
+        if path is not None:
+            self.load(path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, key, move, depth, value):
+        self.entries[key] = (move[0], move[1], move[2], move[3], depth, value)
+
+    # Return the book move (oldrow, oldcol, row, col) of the position with the given hash, None if there is none
+    def lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        return entry[0], entry[1], entry[2], entry[3]
+
+    def load(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            magic, version, count, *weights = HEADER.unpack_from(data, 0)
+        except struct.error:
+            magic, version = None, None
+        if magic == MAGIC and version != VERSION:
+            raise ValueError("The opening book {0} has the old format version {1:d}, build it again".format(
+                path, version))
+        if magic != MAGIC or len(data) != HEADER.size + count * ENTRY.size:
+            raise ValueError("Not an opening book file: {0}".format(path))
+        self.weights = tuple(weights)
+        self.entries = {}
+        for key, oldsquare, square, depth, value in ENTRY.iter_unpack(data[HEADER.size:]):
+            self.entries[key] = (oldsquare >> 3, oldsquare & 7, square >> 3, square & 7, depth, value)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(self.entries), *self.weights))
+            for key in sorted(self.entries):
+                oldrow, oldcol, row, col, depth, value = self.entries[key]
+                f.write(ENTRY.pack(key, oldrow * 8 + oldcol, row * 8 + col, depth, value))
+
+
+# Worker process task: search the AI's move in the given position with a new AIPlayer.
+# Returns the move, the depth of the deepest completed iteration and the value of the position it found.
+def searchPosition(position, options):
+    player = AIPlayer(None, 1, **options)
+    try:
+        state = AIGameState.fromPosition(position)
+        move = player.getNextMove(state)
+        stats = player.searchStats
+        if stats.value is None:
+            # the only legal move is played without searching, so the position has no value
+            return move, 0, 0
+        return move, stats.completedDepth, stats.value
+    finally:
+        player.shutdown()
+
+
+# Build a book for the AI positions of the first plies moves of a game, whichever player moves first.
+# In AI positions only the move found by the search is followed, in human positions every reply.
+# options are the AIPlayer keyword arguments of the searches.
+def buildBook(plies, options, workers, verbose=False):
+    book = OpeningBook(weights=options.get("weights", DEFAULT_WEIGHTS))
+    start = AIGameState(GameEngine())
+    # positions to expand as (AI bitboard, human bitboard, whether the human moves)
+    frontier = {start.getPosition() + (False,), start.getPosition() + (True,)}
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        for ply in range(plies):
+            starttime = time.perf_counter()
+            positions = [(AIPieces, humanPieces) for AIPieces, humanPieces, humanTurn in sorted(frontier)
+                         if not humanTurn]
+            positions = [position for position in positions
+                         if AIGameState.fromPosition(position).hash not in book.entries]
+            results = executor.map(searchPosition, positions, [options] * len(positions))
+
+            nextFrontier = set()
+            for position, (move, depth, value) in zip(positions, results):
+                state = AIGameState.fromPosition(position)
+                book.add(state.hash, move, depth, value)
+                state.applyAction(list(move))
+                expand(nextFrontier, state, True)
+            for AIPieces, humanPieces, humanTurn in sorted(frontier):
+                if humanTurn:
+                    state = AIGameState.fromPosition((AIPieces, humanPieces))
+                    for action in state.getActions(True):
+                        captured = state.applyAction(action)
+                        expand(nextFrontier, state, False)
+                        state.resetAction(action, captured)
+            frontier = nextFrontier
+            if verbose:
+                print("ply {0:d}: searched {1:d} positions in {2:.1f} seconds".format(
+                    ply + 1, len(positions), time.perf_counter() - starttime))
+    return book
+
+
+# Add a position with the given player to move to the frontier of buildBook.
+# A player who cannot move passes, and finished games are left out.
+def expand(frontier, state, humanTurn):
+    if not state.getActions(humanTurn):
+        if not state.getActions(not humanTurn):
+            return
+        humanTurn = not humanTurn
+    frontier.add(state.getPosition() + (humanTurn,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an opening book for the AI player.")
+    parser.add_argument("output", help="opening book file to write")
+    parser.add_argument("--plies", type=int, default=6, help="number of opening moves covered (default 6)")
+    parser.add_argument("--depth", type=int, default=12, help="depth limit of the searches (default 12)")
+    parser.add_argument("--time-limit", type=float, default=60, help="seconds per search (default 60)")
+    parser.add_argument("--weights", help="evaluation weights of the AI player, e.g. 500/50/50/10/1 (default)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of positions searched at the same time (default: number of CPUs)")
+    args = parser.parse_args()
+
+    options = {"searchDepth": args.depth, "timeLimit": args.time_limit}
+    if args.weights:
+        try:
+            options["weights"] = tuple(int(weight) for weight in args.weights.split("/"))
+        except ValueError:
+            parser.error("Invalid weights: {0}".format(args.weights))
+        if len(options["weights"]) != len(DEFAULT_WEIGHTS):
+            parser.error("Expected {0:d} weights: {1}".format(len(DEFAULT_WEIGHTS), args.weights))
+
+    starttime = time.perf_counter()
+    book = buildBook(args.plies, options, args.workers, verbose=True)
+    book.save(args.output)
+    print("Wrote {0:d} positions to {1} in {2:.1f} seconds".format(len(book), args.output,
+                                                                   time.perf_counter() - starttime))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
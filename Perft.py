@@ -0,0 +1,115 @@
+import argparse  # for the command line options
+import sys  # for the exit status
+import time  # to measure nodes per second
+from AIPlayer import AIGameState
+from GameEngine import GameEngine
+
+# Leaf counts of the initial position by depth. The position is symmetric, so the counts are the same
+# whether the AI or the human moves first. Both move generators agree on them.
+# A player without legal moves passes without using up depth, as in the game and in the search.
+REFERENCE_COUNTS = [1, 7, 49, 302, 1469, 7361, 36768, 180018, 844361, 3923504]
+
+
+# Count the positions reached after exactly depth moves, starting with the human player if humanTurn.
+# Uses the bitboard move generator of the AI player with packed moves,
+# generated into moveStack[depth], one list per remaining depth.
+def perft(state, depth, humanTurn, moveStack=None):
+    if depth == 0:
+        return 1
+    if state.AIPieces == 0 or state.humanPieces == 0:
+        return 0
+    if moveStack is None:
+        moveStack = [[] for _ in range(depth + 1)]
+    moves = state.generateMoves(humanTurn, moveStack[depth])
+    if not moves:
+        # pass the turn to the other player, the game is over if it cannot move either
+        moves = state.generateMoves(not humanTurn, moves)
+        humanTurn = not humanTurn
+    nodes = 0
+    for move in moves:
+        captured = state.makeMove(move)
+        nodes += perft(state, depth - 1, not humanTurn, moveStack)
+        state.unmakeMove(move, captured)
+    return nodes
+
+
+# Same count as perft, using the rules of GameEngine on its list board
+def perftBoard(game, depth, playerTurn):
+    if depth == 0:
+        return 1
+    if len(game.playerCheckers) == 0 or len(game.opponentCheckers) == 0:
+        return 0
+    actions = game.getPossibleActions(playerTurn)
+    if not actions:
+        # pass the turn to the other player, the game is over if it cannot move either
+        actions = game.getPossibleActions(not playerTurn)
+        playerTurn = not playerTurn
+    nodes = 0
+    for oldrow, oldcol, row, col in actions:
+        captured = game.makeMove(oldrow, oldcol, row, col)
+        nodes += perftBoard(game, depth - 1, not playerTurn)
+        game.undoMove(oldrow, oldcol, row, col, captured)
+    return nodes
+
+
+# Create a GameEngine from a position written as 8 rows separated by '/',
+# with 'a' for an AI checker, 'h' for a human checker and '.' for an empty square
+def parsePosition(text):
+    rows = text.split("/")
+    if len(rows) != 8 or any(len(row) != 8 or set(row) - set("ah.") for row in rows):
+        raise ValueError("Invalid position: {0}".format(text))
+    game = GameEngine()
+    game.setBoard([[-1 if square == "a" else 1 if square == "h" else 0 for square in row] for row in rows])
+    return game
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count and time the leaf nodes of the move generators.")
+    parser.add_argument("--depth", type=int, default=6, help="largest depth to count (default 6)")
+    parser.add_argument("--human-first", action="store_true", help="the human player moves first")
+    parser.add_argument("--position", help="start position, 8 rows of 'a', 'h' and '.' separated by '/'")
+    parser.add_argument("--generator", choices=["bitboard", "board"], default="bitboard",
+                        help="AIGameState bitboards or the GameEngine board rules (default bitboard)")
+    parser.add_argument("--divide", action="store_true", help="print the count below every first move")
+    args = parser.parse_args()
+
+    try:
+        game = parsePosition(args.position) if args.position else GameEngine()
+    except ValueError as e:
+        parser.error(str(e))
+    reference = REFERENCE_COUNTS if not args.position else []
+    state = AIGameState(game)
+
+    failed = False
+    print("depth {0:>12} {1:>10} {2:>12}  reference".format("nodes", "seconds", "nodes/sec"))
+    for depth in range(1, args.depth + 1):
+        starttime = time.perf_counter()
+        if args.generator == "bitboard":
+            nodes = perft(state, depth, args.human_first)
+        else:
+            nodes = perftBoard(game, depth, args.human_first)
+        seconds = time.perf_counter() - starttime
+        if depth < len(reference):
+            check = "ok" if nodes == reference[depth] else "MISMATCH (expected {0:d})".format(reference[depth])
+            failed = failed or nodes != reference[depth]
+        else:
+            check = "-"
+        print("{0:5d} {1:12d} {2:10.3f} {3:12.0f}  {4}".format(depth, nodes, seconds,
+                                                               nodes / seconds if seconds > 0 else 0, check))
+
+    if args.divide:
+        humanTurn = args.human_first
+        actions = state.getActions(humanTurn)
+        if not actions:
+            humanTurn = not humanTurn
+            actions = state.getActions(humanTurn)
+        for action in actions:
+            captured = state.applyAction(action)
+            print("{0}: {1:d}".format(action, perft(state, args.depth - 1, not humanTurn)))
+            state.resetAction(action, captured)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import json  # for the JSON lines export
+
+# Positions of the counters of one alpha-beta search, as returned by AIPlayer.getSearchCounters
+MAX_DEPTH = 0
+NODES = 1
+MAX_PRUNING = 2
+MIN_PRUNING = 3
+FIRST_MOVE_CUTOFFS = 4
+TT_PROBES = 5
+TT_HITS = 6
+TT_CUTOFFS = 7
+TABLEBASE_HITS = 8
+QUIESCENCE_NODES = 9
+QUIESCENCE_BUDGET_HITS = 10
+
+
+# Statistics of the AI player's search for one move: the counters of all iterations of iterative deepening,
+# the time and value of every completed iteration and the principal variation.
+# AIPlayer passes one to its observers after every move, see AIPlayer.addObserver.
+class SearchStats:
+    def __init__(self, source="search", depthLimit=0):
+        # "search", "book" for a move of the opening book or "ponder" for a move found by pondering
+        self.source = source
+        self.depthLimit = depthLimit
+        self.completedDepth = 0
+        self.timedOut = False
+        self.move = None
+        self.value = None
+        self.pv = []
+        self.seconds = 0.0
+        self.counters = [0] * (QUIESCENCE_BUDGET_HITS + 1)
+        # searches of the root again after the value fell outside the aspiration window
+        self.researches = 0
+        # (depth, seconds, nodes, value) of every completed iteration
+        self.iterations = []
+
+    # Add the counters of one search of the root
+    def addSearch(self, counters):
+        self.counters[MAX_DEPTH] = max(self.counters[MAX_DEPTH], counters[MAX_DEPTH])
+        for i in range(NODES, len(self.counters)):
+            self.counters[i] += counters[i]
+
+    def getNodes(self):
+        return self.counters[NODES]
+
+    def getNodesPerSecond(self):
+        return self.counters[NODES] / self.seconds if self.seconds > 0 else 0.0
+
+    # Effective branching factor: the number of nodes of the deepest completed iteration
+    # is about this number to the power of its depth
+    def getBranchingFactor(self):
+        if not self.iterations:
+            return 0.0
+        depth, seconds, nodes, value = self.iterations[-1]
+        return nodes ** (1 / depth) if nodes > 0 else 0.0
+
+    # Share of the transposition table lookups that found the position
+    def getTTHitRate(self):
+        probes = self.counters[TT_PROBES]
+        return self.counters[TT_HITS] / probes if probes else 0.0
+
+    # Share of the cutoffs caused by the first move searched, a measure of the move ordering
+    def getFirstMoveCutoffRate(self):
+        cutoffs = self.counters[MAX_PRUNING] + self.counters[MIN_PRUNING]
+        return self.counters[FIRST_MOVE_CUTOFFS] / cutoffs if cutoffs else 0.0
+
+    # The statistics as a dictionary of JSON types
+    def toDict(self):
+        return {
+            "source": self.source,
+            "move": list(self.move) if self.move is not None else None,
+            "value": self.value,
+            "depthLimit": self.depthLimit,
+            "completedDepth": self.completedDepth,
+            "timedOut": self.timedOut,
+            "seconds": self.seconds,
+            "nodes": self.counters[NODES],
+            "maxDepth": self.counters[MAX_DEPTH],
+            "maxPruning": self.counters[MAX_PRUNING],
+            "minPruning": self.counters[MIN_PRUNING],
+            "firstMoveCutoffs": self.counters[FIRST_MOVE_CUTOFFS],
+            "ttProbes": self.counters[TT_PROBES],
+            "ttHits": self.counters[TT_HITS],
+            "ttCutoffs": self.counters[TT_CUTOFFS],
+            "tablebaseHits": self.counters[TABLEBASE_HITS],
+            "quiescenceNodes": self.counters[QUIESCENCE_NODES],
+            "quiescenceBudgetHits": self.counters[QUIESCENCE_BUDGET_HITS],
+            "researches": self.researches,
+            "nodesPerSecond": self.getNodesPerSecond(),
+            "branchingFactor": self.getBranchingFactor(),
+            "ttHitRate": self.getTTHitRate(),
+            "firstMoveCutoffRate": self.getFirstMoveCutoffRate(),
+            "iterations": [{"depth": depth, "seconds": seconds, "nodes": nodes, "value": value}
+                           for depth, seconds, nodes, value in self.iterations],
+            "pv": [list(action) for action in self.pv],
+        }
+
+    # The statistics as readable lines of text
+    def summary(self):
+        if self.source == "book":
+            return "Opening book move {0}".format(self.move)
+        lines = ["{0} {1}: value {2}, depth {3:d} of {4:d}{5}, {6:.3f} seconds".format(
+            "Ponder hit" if self.source == "ponder" else "Search", self.move, self.value, self.completedDepth,
+            self.depthLimit, " (timed out)" if self.timedOut else "", self.seconds),
+            "(1) max depth of the tree = {0:d}".format(self.counters[MAX_DEPTH]),
+            "(2) total number of nodes generated = {0:d}".format(self.counters[NODES]),
+            "(3) number of times pruning occurred in the MAX-VALUE() = {0:d}".format(self.counters[MAX_PRUNING]),
+            "(4) number of times pruning occurred in the MIN-VALUE() = {0:d}".format(self.counters[MIN_PRUNING]),
+            "(5) number of transposition table cutoffs = {0:d}".format(self.counters[TT_CUTOFFS])]
+        if self.counters[TABLEBASE_HITS]:
+            lines.append("(6) number of tablebase hits = {0:d}".format(self.counters[TABLEBASE_HITS]))
+        if self.counters[QUIESCENCE_NODES]:
+            lines.append("(7) number of quiescence nodes = {0:d}, leaves out of quiescence budget = {1:d}".format(
+                self.counters[QUIESCENCE_NODES], self.counters[QUIESCENCE_BUDGET_HITS]))
+        lines.append("{0:.0f} nodes/sec, branching factor {1:.2f}, TT hit rate {2:.1%}, "
+                     "first move cutoffs {3:.1%}".format(self.getNodesPerSecond(), self.getBranchingFactor(),
+                                                         self.getTTHitRate(), self.getFirstMoveCutoffRate()))
+        return "\n".join(lines)
+
+
+# Observer that appends the statistics of every search to a file, one JSON object per line.
+# The given fields, e.g. a player name, are added to every line.
+class JSONLinesExporter:
+    def __init__(self, path, **fields):
+        self.file = open(path, "a")
+        self.fields = fields
+
+    def __call__(self, stats):
+        record = dict(self.fields)
+        record.update(stats.toDict())
+        # one write per line, so that processes appending to the same file do not mix their lines
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,265 @@
+import argparse  # for the command line options
+import itertools  # to enumerate the positions
+import math  # for binomial coefficients
+import mmap  # to read the tables without loading them
+import struct  # for the binary file format
+import sys  # for the byte order and the exit status
+import time  # to report the build time
+from array import array
+from AIPlayer import AIGameState, DEFAULT_WEIGHTS, DARK_SQUARES, DARK_INDEX
+
+# Endgame tablebase: the result of perfect play for every position with at most a few checkers.
+#
+# Checkers only move forward, so no position can repeat and every game ends. A move either
+# advances a checker by one row or captures, which leaves fewer checkers. The tables are therefore
+# solved by backward induction without any iteration: classes of positions with fewer checkers first,
+# and within a class the positions whose checkers have advanced furthest first. Every position then
+# only depends on positions that are already solved.
+#
+# For every position and side to move the tables store the number of AI and human checkers left at
+# the end of the game and the number of moves until then. The result is the one the search would
+# find with an unlimited depth: the AI maximizes and the human minimizes the utility value of the end
+# position. Among equally good moves, the player who is winning takes the shortest way to the end,
+# the other player the longest.
+#
+# File format, little-endian:
+#   header: magic, version, largest number of checkers, number of classes, the two utility weights
+#   one directory entry per class: # of AI checkers, # of human checkers, file offset, # of entries
+#   per class, one 16-bit entry per position and side to move:
+#       final # of AI checkers | final # of human checkers << 4 | number of moves << 8
+
+MAGIC = b"CKTB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHii")
+CLASS_ENTRY = struct.Struct("<HHQQ")
+ENTRY = struct.Struct("<H")
+
+# BINOMIAL[n][k] = n choose k
+BINOMIAL = [[math.comb(n, k) for k in range(33)] for n in range(33)]
+
+
+# Number of positions of the class with numAI AI checkers and numHuman human checkers,
+# each with the AI or the human to move
+def classSize(numAI, numHuman):
+    return BINOMIAL[32][numAI] * BINOMIAL[32 - numAI][numHuman] * 2
+
+
+# Index of a position inside the table of its class.
+# The AI checkers are ranked as a combination of the 32 dark squares, the human checkers as a
+# combination of the dark squares left over, and the lowest bit is the side to move.
+def indexPosition(AIPieces, humanPieces, humanTurn):
+    AIRank = 0
+    pieces = AIPieces
+    i = 0
+    while pieces:
+        low = pieces & -pieces
+        i += 1
+        AIRank += BINOMIAL[DARK_INDEX[low.bit_length() - 1]][i]
+        pieces ^= low
+
+    humanRank = 0
+    pieces = humanPieces
+    j = 0
+    while pieces:
+        low = pieces & -pieces
+        j += 1
+        # skip the squares taken by AI checkers
+        humanRank += BINOMIAL[DARK_INDEX[low.bit_length() - 1] - (AIPieces & (low - 1)).bit_count()][j]
+        pieces ^= low
+
+    return (AIRank * BINOMIAL[32 - i][j] + humanRank) * 2 + humanTurn
+
+
+def encodeEntry(finalAI, finalHuman, distance):
+    return finalAI | finalHuman << 4 | distance << 8
+
+
+def decodeEntry(entry):
+    return entry & 15, entry >> 4 & 15, entry >> 8
+
+
+# Same value as AIGameState.computeUtilityValue of a position with the given numbers of checkers
+def utilityValue(numAI, numHuman, weights):
+    return (numAI - numHuman) * weights[0] + numAI * weights[1]
+
+
+# Solve every class of positions with at most maxPieces checkers, at least one of each player.
+# Returns a dictionary from (# of AI checkers, # of human checkers) to the array of entries of the class.
+def solve(maxPieces, weights=DEFAULT_WEIGHTS, verbose=False):
+    tables = {}
+    for numPieces in range(2, maxPieces + 1):
+        for numAI in range(1, numPieces):
+            starttime = time.perf_counter()
+            tables[(numAI, numPieces - numAI)] = solveClass(numAI, numPieces - numAI, tables, weights)
+            if verbose:
+                print("{0:d} AI + {1:d} human checkers: {2:d} entries in {3:.1f} seconds".format(
+                    numAI, numPieces - numAI, classSize(numAI, numPieces - numAI), time.perf_counter() - starttime))
+    return tables
+
+
+# Solve the class of positions with numAI AI checkers and numHuman human checkers,
+# given the solved tables of all classes with fewer checkers
+def solveClass(numAI, numHuman, tables, weights):
+    table = array("H", [0]) * classSize(numAI, numHuman)
+
+    # Every move without a capture advances a checker by one row. Positions whose checkers have
+    # advanced further (higher potential) are solved first.
+    byPotential = [[] for _ in range(7 * (numAI + numHuman) + 1)]
+    for AISquares in itertools.combinations(DARK_SQUARES, numAI):
+        AIPieces = sum(1 << square for square in AISquares)
+        AIPotential = sum(square >> 3 for square in AISquares)
+        for humanSquares in itertools.combinations([square for square in DARK_SQUARES if not AIPieces >> square & 1],
+                                                   numHuman):
+            potential = AIPotential + sum(7 - (square >> 3) for square in humanSquares)
+            byPotential[potential].append((AIPieces, sum(1 << square for square in humanSquares)))
+
+    state = AIGameState.__new__(AIGameState)
+    state.hash = 0
+    for positions in reversed(byPotential):
+        for AIPieces, humanPieces in positions:
+            state.AIPieces = AIPieces
+            state.humanPieces = humanPieces
+            index = indexPosition(AIPieces, humanPieces, False)
+            AIEntry = solveMoves(state, False, tables, table, weights)
+            humanEntry = solveMoves(state, True, tables, table, weights)
+            # a player who cannot move passes, the game is over when neither can
+            if AIEntry is None:
+                AIEntry = humanEntry if humanEntry is not None else encodeEntry(numAI, numHuman, 0)
+            if humanEntry is None:
+                humanEntry = AIEntry
+            table[index] = AIEntry
+            table[index + 1] = humanEntry
+    return table
+
+
+# Entry of the best move of the AI (humanTurn False) or the human in the given position, None if it cannot move
+def solveMoves(state, humanTurn, tables, table, weights):
+    best = None
+    bestValue = 0
+    bestDistance = 0
+    numAI = state.AIPieces.bit_count()
+    numHuman = state.humanPieces.bit_count()
+    for action in state.getActions(humanTurn):
+        captured = state.applyAction(action)
+        if state.AIPieces == 0 or state.humanPieces == 0:
+            finalAI, finalHuman, distance = state.AIPieces.bit_count(), state.humanPieces.bit_count(), 0
+        else:
+            childTable = table if not captured else tables[(state.AIPieces.bit_count(), state.humanPieces.bit_count())]
+            finalAI, finalHuman, distance = decodeEntry(
+                childTable[indexPosition(state.AIPieces, state.humanPieces, not humanTurn)])
+        state.resetAction(action, captured)
+
+        value = utilityValue(finalAI, finalHuman, weights)
+        if humanTurn:
+            value = -value
+        distance += 1
+        if best is None or value > bestValue:
+            better = True
+        elif value == bestValue:
+            # the winning player ends the game as soon as possible, the other player holds out
+            winning = finalHuman > finalAI if humanTurn else finalAI > finalHuman
+            better = distance < bestDistance if winning else distance > bestDistance
+        else:
+            better = False
+        if better:
+            best = encodeEntry(finalAI, finalHuman, distance)
+            bestValue = value
+            bestDistance = distance
+    return best
+
+
+# Write solved tables to a tablebase file
+def writeTablebase(path, tables, maxPieces, weights=DEFAULT_WEIGHTS):
+    classes = sorted(tables, key=lambda numbers: (sum(numbers), numbers))
+    offset = HEADER.size + CLASS_ENTRY.size * len(classes)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, maxPieces, len(classes), weights[0], weights[1]))
+        for numAI, numHuman in classes:
+            f.write(CLASS_ENTRY.pack(numAI, numHuman, offset, len(tables[(numAI, numHuman)])))
+            offset += ENTRY.size * len(tables[(numAI, numHuman)])
+        for numbers in classes:
+            table = tables[numbers]
+            if sys.byteorder != "little":
+                table = array("H", table)
+                table.byteswap()
+            table.tofile(f)
+
+
+# Solved endgames read from a tablebase file. The file is memory-mapped,
+# so only the parts that are probed are ever read from disk.
+class Tablebase:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.maxPieces, numClasses, weight0, weight1 = HEADER.unpack_from(self.data, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("Not a tablebase file: {0}".format(path))
+        except (ValueError, struct.error):
+            self.file.close()
+            raise
+        # the tables are only valid for players whose utility values use these weights
+        self.utilityWeights = (weight0, weight1)
+        # offsets[numAI][numHuman] is the file offset of the class
+        self.offsets = [[None] * (self.maxPieces + 1) for _ in range(self.maxPieces + 1)]
+        for i in range(numClasses):
+            numAI, numHuman, offset, size = CLASS_ENTRY.unpack_from(self.data, HEADER.size + i * CLASS_ENTRY.size)
+            self.offsets[numAI][numHuman] = offset
+        self.probes = 0
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    # Check whether the utility weights (the first two of the evaluation weights) match those of the tables
+    def supportsWeights(self, weights):
+        return tuple(weights[:2]) == self.utilityWeights
+
+    # Return (final # of AI checkers, final # of human checkers, number of moves) of perfect play
+    # from the given position, None if the tables do not cover it
+    def lookup(self, AIPieces, humanPieces, humanTurn):
+        numAI = AIPieces.bit_count()
+        numHuman = humanPieces.bit_count()
+        if numAI == 0 or numHuman == 0 or numAI + numHuman > self.maxPieces:
+            return None
+        self.probes += 1
+        offset = self.offsets[numAI][numHuman] + ENTRY.size * indexPosition(AIPieces, humanPieces, humanTurn)
+        return decodeEntry(ENTRY.unpack_from(self.data, offset)[0])
+
+    # Utility value of the end of the game under perfect play, for a position with
+    # at least one checker of each player and at most maxPieces checkers
+    def probe(self, AIPieces, humanPieces, humanTurn):
+        numAI = AIPieces.bit_count()
+        numHuman = humanPieces.bit_count()
+        offset = self.offsets[numAI][numHuman] + ENTRY.size * indexPosition(AIPieces, humanPieces, humanTurn)
+        self.probes += 1
+        entry = ENTRY.unpack_from(self.data, offset)[0]
+        return ((entry & 15) - (entry >> 4 & 15)) * self.utilityWeights[0] + (entry & 15) * self.utilityWeights[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an endgame tablebase for the AI player.")
+    parser.add_argument("output", help="tablebase file to write")
+    parser.add_argument("--pieces", type=int, default=4, help="largest number of checkers on the board (default 4)")
+    parser.add_argument("--weights", default="/".join(str(weight) for weight in DEFAULT_WEIGHTS[:2]),
+                        help="utility weights of the AI player, e.g. 500/50 (default)")
+    args = parser.parse_args()
+    if not 2 <= args.pieces <= 15:
+        parser.error("--pieces must be between 2 and 15")
+    try:
+        weights = tuple(int(weight) for weight in args.weights.split("/"))
+    except ValueError:
+        weights = ()
+    if len(weights) < 2:
+        parser.error("Invalid weights: {0}".format(args.weights))
+
+    starttime = time.perf_counter()
+    tables = solve(args.pieces, weights, verbose=True)
+    writeTablebase(args.output, tables, args.pieces, weights)
+    print("Wrote {0:d} entries to {1} in {2:.1f} seconds".format(sum(len(table) for table in tables.values()),
+                                                                args.output, time.perf_counter() - starttime))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import argparse  # for the command line options
+import os  # for the number of CPUs
+import random  # for the random opening moves
+import sys  # for the exit status
+import time  # to measure move latency and games per hour
+import concurrent.futures  # to play games in parallel
+from AIPlayer import AIPlayer, AIGameState
+from SearchStats import JSONLinesExporter
+from GameEngine import GameEngine
+
+# AIPlayer options a player configuration may set, with the function that parses their value
+PLAYER_OPTIONS = {
+    "difficulty": int,
+    "searchDepth": int,
+    "timeLimit": float,
+    "ttMemory": int,
+    "weights": lambda text: tuple(int(weight) for weight in text.split("/")),
+    "tablebase": str,
+    "openingBook": str,
+    "searchMode": str,
+    "quiescenceNodes": int,
+}
+
+DEFAULT_PLAYERS = ["medium:difficulty=2", "hard:difficulty=1"]
+
+
+# Parse a player configuration written as name:option=value,option=value,
+# e.g. "deep:difficulty=1,searchDepth=8" or "safe:weights=500/50/50/20/1".
+# Returns the name and the AIPlayer keyword arguments.
+def parsePlayer(text):
+    name, _, optionText = text.partition(":")
+    if not name:
+        raise ValueError("Player configuration without a name: {0}".format(text))
+    options = {"difficulty": 1}
+    for option in filter(None, optionText.split(",")):
+        key, _, value = option.partition("=")
+        if key not in PLAYER_OPTIONS:
+            raise ValueError("Unknown player option {0} in {1}".format(key, text))
+        options[key] = PLAYER_OPTIONS[key](value)
+    return name, options
+
+
+# The board seen from the other side: rotated by 180 degrees with the checkers of the players swapped.
+# AIPlayer always plays the negative checkers, so the player of the positive checkers searches this board.
+def mirrorBoard(board):
+    return [[-board[7 - row][7 - col] for col in range(8)] for row in range(8)]
+
+
+# A move on the mirrored board as a move on the real board, and the other way round
+def mirrorMove(move):
+    return 7 - move[0], 7 - move[1], 7 - move[2], 7 - move[3]
+
+
+# Every pair of players plays gamesPerPair games. The players alternate between the two sides,
+# and every second pair of games the other side moves first.
+# A job is (game number, (name, options) of the negative side, (name, options) of the positive side,
+# whether the positive side moves first, number of random opening moves, random seed,
+# file the search statistics are appended to or None).
+def createJobs(players, gamesPerPair, randomPlies, seed, statsPath=None):
+    jobs = []
+    for i in range(len(players)):
+        for j in range(i + 1, len(players)):
+            for game in range(gamesPerPair):
+                first, second = (players[i], players[j]) if game % 2 == 0 else (players[j], players[i])
+                jobs.append((len(jobs), first, second, game // 2 % 2 == 1, randomPlies, seed * 1000003 + len(jobs),
+                             statsPath))
+    return jobs
+
+
+# Play one game of a job created by createJobs and return its result:
+# the job number, the names of the negative and positive sides, the winner
+# (1 positive side, -1 negative side, 0 draw, as GameEngine.getWinner), the number of moves,
+# per side the number of searched moves, their total seconds and total nodes,
+# and the start position and moves for GameRecord.GameRecordWriter.append.
+def playGame(job):
+    number, (negativeName, negativeOptions), (positiveName, positiveOptions), playerTurn, randomPlies, seed, \
+        statsPath = job
+    game = GameEngine(playerTurn)
+    players = {False: AIPlayer(None, **negativeOptions), True: AIPlayer(None, **positiveOptions)}
+    exporters = []
+    if statsPath is not None:
+        for side, name in ((False, negativeName), (True, positiveName)):
+            exporters.append(JSONLinesExporter(statsPath, game=number, player=name, side="positive" if side
+                                               else "negative"))
+            players[side].addObserver(exporters[-1])
+    stats = {False: [0, 0.0, 0], True: [0, 0.0, 0]}
+    rng = random.Random(seed)
+    start = AIGameState(game).getPosition() + (playerTurn,)
+    history = []
+
+    moves = 0
+    try:
+        while not game.isGameOver():
+            side = game.isPlayerTurn()
+            if moves < randomPlies:
+                # start from a random position, so that the same players do not repeat the same game
+                move = rng.choice(game.getPossibleActions(side))
+            else:
+                board = mirrorBoard(game.getBoard()) if side else game.getBoard()
+                starttime = time.perf_counter()
+                move = players[side].getNextMove(AIGameState.fromBoard(board))
+                stats[side][0] += 1
+                stats[side][1] += time.perf_counter() - starttime
+                stats[side][2] += players[side].searchStats.getNodes()
+                if side:
+                    move = mirrorMove(move)
+            if not game.play(*move):
+                raise RuntimeError("Illegal move {0} in game {1:d}".format(move, number))
+            history.append(list(move))
+            moves += 1
+    finally:
+        for player in players.values():
+            player.shutdown()
+        for exporter in exporters:
+            exporter.close()
+
+    return number, negativeName, positiveName, game.getWinner(), moves, stats[False], stats[True], start, history
+
+
+# Wins, draws, losses and search statistics of every player
+class TournamentResults:
+    def __init__(self, names):
+        self.names = names
+        # scores[name][opponent] = [wins, draws, losses]
+        self.scores = {name: {opponent: [0, 0, 0] for opponent in names} for name in names}
+        # searches[name] = [searched moves, seconds, nodes]
+        self.searches = {name: [0, 0.0, 0] for name in names}
+        self.games = 0
+
+    def add(self, result):
+        number, negativeName, positiveName, winner, moves, negativeStats, positiveStats, start, history = result
+        self.games += 1
+        # index 0 counts wins, 1 draws, 2 losses
+        self.scores[positiveName][negativeName][1 - winner] += 1
+        self.scores[negativeName][positiveName][1 + winner] += 1
+        for name, stats in ((negativeName, negativeStats), (positiveName, positiveStats)):
+            for i in range(3):
+                self.searches[name][i] += stats[i]
+
+    def printTables(self, seconds):
+        width = max(8, max(len(name) for name in self.names) + 1)
+        print("Wins-draws-losses (row player against column player)")
+        print("".ljust(width) + "".join(name.rjust(width + 4) for name in self.names) + "total".rjust(width + 4))
+        for name in self.names:
+            total = [sum(score[i] for score in self.scores[name].values()) for i in range(3)]
+            cells = ["-" if opponent == name else "{0:d}-{1:d}-{2:d}".format(*self.scores[name][opponent])
+                     for opponent in self.names]
+            print(name.ljust(width) + "".join(cell.rjust(width + 4) for cell in cells)
+                  + "{0:d}-{1:d}-{2:d}".format(*total).rjust(width + 4))
+
+        print()
+        print("{0} {1:>8} {2:>12} {3:>14} {4:>12}".format("player".ljust(width), "moves", "latency ms",
+                                                          "nodes/move", "nodes/sec"))
+        for name in self.names:
+            moves, moveSeconds, nodes = self.searches[name]
+            print("{0} {1:8d} {2:12.1f} {3:14.0f} {4:12.0f}".format(
+                name.ljust(width), moves, 1000 * moveSeconds / moves if moves else 0,
+                nodes / moves if moves else 0, nodes / moveSeconds if moveSeconds > 0 else 0))
+
+        print()
+        print("{0:d} games in {1:.1f} seconds, {2:.0f} games per hour".format(
+            self.games, seconds, self.games * 3600 / seconds if seconds > 0 else 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play AI player configurations against each other.")
+    parser.add_argument("--player", action="append", metavar="NAME:OPTION=VALUE,...",
+                        help="a player configuration, e.g. 'deep:difficulty=1,searchDepth=8,weights=500/50/50/10/1'; "
+                             "options: " + ", ".join(PLAYER_OPTIONS) + " (default: " + " ".join(DEFAULT_PLAYERS) + ")")
+    parser.add_argument("--games", type=int, default=10, help="games per pair of players (default 10)")
+    parser.add_argument("--time-limit", type=float, default=1.0,
+                        help="seconds per move of players without their own timeLimit (default 1)")
+    parser.add_argument("--random-plies", type=int, default=2,
+                        help="random moves at the start of every game (default 2)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random moves (default 0)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="number of games played at the same time (default: number of CPUs)")
+    parser.add_argument("--record", metavar="PATH", help="append the games to this game record file")
+    parser.add_argument("--stats", metavar="PATH",
+                        help="append the search statistics of every move to this file as JSON lines")
+    args = parser.parse_args()
+
+    try:
+        players = [parsePlayer(text) for text in args.player or DEFAULT_PLAYERS]
+    except ValueError as e:
+        parser.error(str(e))
+    names = [name for name, options in players]
+    if len(set(names)) != len(names) or len(names) < 2:
+        parser.error("At least two players with different names are needed")
+    for name, options in players:
+        options.setdefault("timeLimit", args.time_limit)
+
+    jobs = createJobs(players, args.games, args.random_plies, args.seed, args.stats)
+    results = TournamentResults(names)
+    recordWriter = None
+    if args.record:
+        from GameRecord import GameRecordWriter
+        try:
+            recordWriter = GameRecordWriter(args.record)
+        except ValueError as e:
+            parser.error(str(e))
+    starttime = time.perf_counter()
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [executor.submit(playGame, job) for job in jobs]
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                result = future.result()
+                results.add(result)
+                if recordWriter is not None:
+                    recordWriter.append(result[7], result[8], result[3])
+                print("\rPlayed {0:d}/{1:d} games".format(done, len(jobs)), end="", file=sys.stderr, flush=True)
+    finally:
+        if recordWriter is not None:
+            recordWriter.close()
+    print(file=sys.stderr)
+
+    results.printTables(time.perf_counter() - starttime)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# Bound types stored with every entry
+EXACT = 0
+LOWER_BOUND = 1  # the search failed high, the real value is at least the stored value
+UPPER_BOUND = 2  # the search failed low, the real value is at most the stored value
+
+# Positions of the fields inside an entry tuple
+KEY = 0
+DEPTH = 1
+FLAG = 2
+VALUE = 3
+MOVE = 4
+GENERATION = 5
+
+# Approximate number of bytes one entry takes in memory: the list slot, the tuple and its hash key
+ENTRY_SIZE = 160
+
+REPLACEMENT_POLICIES = ("depth", "always")
+
+
+# Fixed size hash table of searched positions, indexed by the low bits of a Zobrist key.
+# Every slot holds one (key, depth, flag, value, move, generation) tuple.
+class TranspositionTable:
+    def __init__(self, maxMemory=64 * 1024 * 1024, replacement="depth"):
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError("Unknown replacement policy: {0}".format(replacement))
+        # largest power of two number of entries that fits in the memory cap
+        size = 1 << max(0, (maxMemory // ENTRY_SIZE).bit_length() - 1)
+        self.mask = size - 1
+        self.entries = [None] * size
+        self.replacement = replacement
+        self.generation = 0
+
+        # statistics
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Start a new search. Entries of older searches become the first to be replaced.
+    def newSearch(self):
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+        self.generation = 0
+
+    # Return the entry stored for the given key, None if there is none
+    def lookup(self, key):
+        self.probes += 1
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[KEY] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    # Store the result of searching the given position.
+    # With the "depth" policy, a slot holding a different position of the current search
+    # is only replaced by a result searched at least as deep.
+    def store(self, key, depth, flag, value, move):
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is not None and entry[KEY] != key:
+            if self.replacement == "depth" and entry[GENERATION] == self.generation and entry[DEPTH] > depth:
+                return
+            self.overwrites += 1
+        self.entries[index] = (key, depth, flag, value, move, self.generation)
+        self.stores += 1
+
+
+# Bytes of one entry of SharedTranspositionTable: two 64-bit words
+SHARED_ENTRY_SIZE = 16
+# Stored values are offset by this much, so that they fit the low 32 bits of the data word as unsigned numbers.
+# Values must lie in [-VALUE_BIAS, VALUE_BIAS), AIPlayer rejects weights that could give larger ones.
+VALUE_BIAS = 1 << 31
+
+
+# Transposition table in a block of shared memory, which the processes of the Lazy SMP search
+# read and write at the same time without any lock.
+#
+# An entry is two 64-bit words: the data (value + VALUE_BIAS | depth << 32 | flag << 40 | move << 42
+# | generation << 54, with move 0 for no move) and the key XOR the data. A reader only accepts the entry
+# if the two words XOR to the key it looks for, so an entry that another process was writing at the
+# same time (one word old, one word new) reads as a miss instead of a wrong result.
+# The first two words hold the generation of the current search, which only the owner advances.
+#
+# lookup returns the same (key, depth, flag, value, move, generation) tuples as TranspositionTable.
+class SharedTranspositionTable:
+    # With a name, attach to the table that another process created with the same memory size
+    def __init__(self, maxMemory=64 * 1024 * 1024, replacement="depth", name=None):
+        from multiprocessing import shared_memory
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError("Unknown replacement policy: {0}".format(replacement))
+        size = 1 << max(0, (maxMemory // SHARED_ENTRY_SIZE).bit_length() - 1)
+        self.mask = size - 1
+        self.replacement = replacement
+        # only the process that created the table advances the generation and unlinks the memory
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=(size + 1) * SHARED_ENTRY_SIZE)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.words = self.memory.buf.cast("Q")
+
+        # statistics of this process
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def __len__(self):
+        return self.mask + 1
+
+    @property
+    def generation(self):
+        return self.words[0]
+
+    # Start a new search. Entries of older searches become the first to be replaced.
+    def newSearch(self):
+        if self.owner:
+            self.words[0] = (self.words[0] + 1) & 255
+
+    def clear(self):
+        if self.owner:
+            self.memory.buf[:] = bytes(len(self.memory.buf))
+
+    # Detach from the shared memory, and free it in the process that created it
+    def close(self):
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    # Return the entry stored for the given key, None if there is none
+    def lookup(self, key):
+        self.probes += 1
+        index = ((key & self.mask) + 1) << 1
+        words = self.words
+        data = words[index + 1]
+        if words[index] ^ data != key:
+            return None
+        self.hits += 1
+        return (key, data >> 32 & 255, data >> 40 & 3, (data & 0xFFFFFFFF) - VALUE_BIAS, (data >> 42 & 4095) or None,
+                data >> 54)
+
+    # Store the result of searching the given position, with the same replacement policies as TranspositionTable
+    def store(self, key, depth, flag, value, move):
+        index = ((key & self.mask) + 1) << 1
+        words = self.words
+        data = words[index + 1]
+        if words[index] ^ data != key and data:
+            if self.replacement == "depth" and data >> 54 == words[0] and data >> 32 & 255 > depth:
+                return
+            self.overwrites += 1
+        data = (int(value) + VALUE_BIAS) | depth << 32 | flag << 40 | (move or 0) << 42 | words[0] << 54
+        words[index] = key ^ data
+        words[index + 1] = data
+        self.stores += 1
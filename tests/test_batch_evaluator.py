@@ -0,0 +1,48 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AIPlayer import AIGameState
+
+try:
+    import BatchEvaluator
+except ImportError:
+    BatchEvaluator = None
+
+
+@unittest.skipIf(BatchEvaluator is None, "batch evaluation requires NumPy")
+class BatchEvaluatorTest(unittest.TestCase):
+    # Every position gets the value of the depth limit of the search, one position at a time
+    def testSameValuesAsAIGameState(self):
+        rng = random.Random(9)
+        positions = [(0, 1 << 1), (1 << 1, 0)]
+        for i in range(2000):
+            AIPieces = humanPieces = 0
+            for square in rng.sample(range(64), rng.randrange(1, 24)):
+                if rng.random() < 0.5:
+                    AIPieces |= 1 << square
+                else:
+                    humanPieces |= 1 << square
+            positions.append((AIPieces, humanPieces))
+        weights = (300, 20, 40, 7, 3)
+        values = BatchEvaluator.evaluateBitboards([position[0] for position in positions],
+                                                  [position[1] for position in positions], weights)
+        for position, value in zip(positions, values):
+            state = AIGameState.fromPosition(position)
+            state.weights = weights
+            expected = state.computeUtilityValue() if state.terminalTest() else state.computeHeuristic()
+            self.assertEqual(expected, value, position)
+
+    def testBoards(self):
+        state = AIGameState.fromPosition((0x0000000000550055, 0x5500000000aa0000))
+        board = [[-1 if state.AIPieces >> (row * 8 + col) & 1 else 1 if state.humanPieces >> (row * 8 + col) & 1
+                  else 0 for col in range(8)] for row in range(8)]
+        self.assertEqual([state.computeHeuristic()],
+                         BatchEvaluator.evaluateBoards(BatchEvaluator.stackBoards([board])).tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import concurrent.futures
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AIPlayer import AIGameState
+from GameEngine import GameEngine
+from MoveService import MoveService
+
+START = AIGameState(GameEngine(playerTurn=False)).getPosition()
+MOVE = (2, 1, 3, 0)
+
+
+# Positions with a single AI checker on the given dark square and a human checker far away
+def position(square):
+    return 1 << square, 1 << 62
+
+
+# Move service whose searches are futures the test finishes by hand, in the order they were started
+class ManualMoveService(MoveService):
+    def __init__(self, **kwargs):
+        MoveService.__init__(self, workers=1, **kwargs)
+        # (key, timeLimit, future) of every search started
+        self.searches = []
+
+    def startSearch(self, key, timeLimit):
+        search = concurrent.futures.Future()
+        self.searches.append((key, timeLimit, search))
+        return search
+
+    # Finish the oldest running search with the given completeness
+    def finish(self, complete=True):
+        for key, timeLimit, search in self.searches:
+            if not search.done():
+                search.set_result((MOVE, complete))
+                return key
+        raise AssertionError("no search is running")
+
+
+class MoveServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.service = ManualMoveService()
+
+    def tearDown(self):
+        for key, timeLimit, search in self.service.searches:
+            if not search.done():
+                search.set_result((MOVE, True))
+        self.service.shutdown()
+
+    def testGamesTakeTurns(self):
+        for square in (1, 3, 5):
+            self.service.submit("a", position(square))
+        self.service.submit("b", position(7))
+        order = [self.service.finish() for i in range(4)]
+        self.assertEqual([position(square) + (1,) for square in (1, 3, 7, 5)], order)
+
+    def testIdenticalPositionsShareSearch(self):
+        first = self.service.submit("a", START)
+        second = self.service.submit("b", START)
+        self.service.finish()
+        self.assertEqual(MOVE, first.result(0))
+        self.assertEqual(MOVE, second.result(0))
+        self.assertEqual(1, len(self.service.searches))
+        self.assertEqual(1, self.service.numShared)
+
+    def testOtherDifficultyIsAnotherSearch(self):
+        self.service.submit("a", START, difficulty=1)
+        self.service.submit("a", START, difficulty=2)
+        self.service.finish()
+        self.service.finish()
+        self.assertEqual(2, len(self.service.searches))
+        self.assertEqual(0, self.service.numShared)
+
+    def testCancelledRequestIsNotSearched(self):
+        self.service.submit("a", position(1))
+        waiting = self.service.submit("a", position(3))
+        self.assertTrue(waiting.cancel())
+        self.service.finish()
+        self.assertEqual(1, len(self.service.searches))
+        self.assertEqual(0, self.service.getStats()["pending"])
+
+    def testCompleteSearchIsCached(self):
+        self.service.submit("a", START)
+        self.service.finish(complete=True)
+        cached = self.service.submit("b", START, deadline=5)
+        self.assertEqual(MOVE, cached.result(0))
+        self.assertEqual(1, len(self.service.searches))
+        self.assertEqual(1, self.service.numCacheHits)
+
+    def testTruncatedSearchIsNotCached(self):
+        self.service.submit("a", START)
+        self.service.finish(complete=False)
+        self.service.submit("b", START, deadline=5)
+        self.assertEqual(2, len(self.service.searches))
+        self.assertEqual(0, self.service.numCacheHits)
+
+    def testLateRequestIsNotCached(self):
+        late = self.service.submit("a", START, deadline=0)
+        key, timeLimit, search = self.service.searches[0]
+        self.assertEqual(0, timeLimit)
+        self.assertEqual(1, self.service.numLate)
+        # the move of a late search is not kept even if the search reached its depth limit
+        self.service.finish(complete=True)
+        self.assertEqual(MOVE, late.result(0))
+        self.service.submit("b", START, deadline=5)
+        self.assertEqual(2, len(self.service.searches))
+        self.assertEqual(0, self.service.numCacheHits)
+
+    def testInvalidRequests(self):
+        with self.assertRaises(ValueError):
+            self.service.submit("a", START, difficulty=7)
+        with self.assertRaises(ValueError):
+            self.service.submit("a", (1 << 0, 1 << 62))  # light square
+        with self.assertRaises(ValueError):
+            self.service.submit("a", (1 << 1, 1 << 1))  # both players on one square
+        self.assertEqual([], self.service.searches)
+
+
+class MoveServiceSearchTest(unittest.TestCase):
+    # The worker process searches the position and returns a legal move
+    def testSearch(self):
+        with MoveService(workers=1, timeLimit=5, searchDepth=2) as service:
+            move = service.submit("a", START).result()
+        self.assertIn(list(move), AIGameState.fromPosition(START).getActions(False))
+
+
+if __name__ == "__main__":
+    unittest.main()
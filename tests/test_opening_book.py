@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AIPlayer import AIPlayer, AIGameState
+from GameEngine import GameEngine
+from OpeningBook import OpeningBook, buildBook, searchPosition
+
+# Weights whose values do not fit in 16 bits
+LARGE_WEIGHTS = (5000000, 500000, 500000, 100000, 10000)
+
+
+class OpeningBookTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "opening.book")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testSaveAndLoad(self):
+        book = OpeningBook(weights=LARGE_WEIGHTS)
+        book.add(1, (2, 1, 3, 0), 12, 40000000)
+        book.add(2, (2, 3, 3, 4), 10, -40000000)
+        book.save(self.path)
+        loaded = OpeningBook(self.path)
+        self.assertEqual(LARGE_WEIGHTS, loaded.weights)
+        self.assertEqual(book.entries, loaded.entries)
+
+    def testBuildWithLargeWeights(self):
+        book = buildBook(2, {"searchDepth": 3, "timeLimit": 60, "weights": LARGE_WEIGHTS}, 1)
+        self.assertTrue(any(abs(entry[5]) > 32767 for entry in book.entries.values()))
+        book.save(self.path)
+        self.assertEqual(book.entries, OpeningBook(self.path).entries)
+
+        player = AIPlayer(None, 1, weights=LARGE_WEIGHTS, openingBook=self.path)
+        try:
+            state = AIGameState(GameEngine(playerTurn=False))
+            self.assertEqual(book.lookup(state.hash), player.openingBook.lookup(state.hash))
+        finally:
+            player.shutdown()
+
+    # The book value is the exact value of the root, the same as a plain alpha-beta search finds
+    def testSearchPositionValue(self):
+        state = AIGameState(GameEngine(playerTurn=False))
+        move, depth, value = searchPosition(state.getPosition(), {"searchDepth": 4, "timeLimit": 60})
+        player = AIPlayer(None, 1)
+        try:
+            player.alphaBetaSearch(state, 4)
+        finally:
+            player.shutdown()
+        self.assertEqual((4, player.rootValue), (depth, value))
+
+    def testSearchPositionForcedMove(self):
+        # a single AI checker on the right edge has one move
+        self.assertEqual(((1, 7, 2, 6), 0, 0), searchPosition((1 << 15, 1 << 62), {"searchDepth": 4, "timeLimit": 60}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AIPlayer import AIPlayer, AIGameState, DARK_SQUARES
+import Tablebase
+
+
+# Random positions with the given number of checkers, where the AI has a move
+def randomPositions(rng, count, numPieces):
+    positions = []
+    while len(positions) < count:
+        squares = rng.sample(DARK_SQUARES, numPieces)
+        numAI = rng.randrange(1, numPieces)
+        state = AIGameState.fromPosition((sum(1 << square for square in squares[:numAI]),
+                                          sum(1 << square for square in squares[numAI:])))
+        if state.AICanContinue():
+            positions.append(state)
+    return positions
+
+
+class TablebaseSearchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "endgame.tb")
+        Tablebase.writeTablebase(cls.path, Tablebase.solve(3), 3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    # Below the root the search probes the tablebase, so it finds the value of perfect play at any depth
+    def testSearchProbesTablebase(self):
+        player = AIPlayer(None, 1, tablebase=self.path, timeLimit=None)
+        try:
+            for state in randomPositions(random.Random(11), 100, 3):
+                expected = player.tablebase.probe(state.AIPieces, state.humanPieces, False)
+                for depthLimit in (1, 2, 3):
+                    player.alphaBetaSearch(state, depthLimit)
+                    self.assertEqual(expected, player.rootValue, (state.getPosition(), depthLimit))
+        finally:
+            player.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
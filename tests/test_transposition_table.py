@@ -0,0 +1,34 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AIPlayer import AIPlayer, DEFAULT_WEIGHTS, maxAbsValue
+from TranspositionTable import SharedTranspositionTable, VALUE_BIAS, EXACT, LOWER_BOUND
+
+
+class SharedTranspositionTableTest(unittest.TestCase):
+    def setUp(self):
+        self.table = SharedTranspositionTable(1 << 16)
+
+    def tearDown(self):
+        self.table.close()
+
+    # The largest values keep their depth, flag and move
+    def testValueRange(self):
+        self.table.store(5, 7, EXACT, VALUE_BIAS - 1, 1234)
+        self.table.store(6, 9, LOWER_BOUND, -VALUE_BIAS, 4095)
+        self.assertEqual((5, 7, EXACT, VALUE_BIAS - 1, 1234), self.table.lookup(5)[:5])
+        self.assertEqual((6, 9, LOWER_BOUND, -VALUE_BIAS, 4095), self.table.lookup(6)[:5])
+
+    def testLazySMPRejectsLargeWeights(self):
+        self.assertLess(maxAbsValue(DEFAULT_WEIGHTS), VALUE_BIAS)
+        with self.assertRaises(ValueError):
+            AIPlayer(None, 1, workers=2, parallelMode="lazysmp", weights=(10 ** 8, 1, 1, 1, 1))
+        # a player without the shared table has no such limit
+        AIPlayer(None, 1, weights=(10 ** 8, 1, 1, 1, 1)).shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()